@@ -0,0 +1,127 @@
+"""Per-request cost of access logging: none, the old print() middleware, and
+the structured AccessLogMiddleware, with log output going to a sink that
+takes --sink-delay-ms per write (a slow pipe or terminal).
+
+Run from the project root:
+
+    python -m benchmarks.access_log --requests 5000 --sink-delay-ms 0.2
+"""
+import argparse
+import asyncio
+import contextlib
+import time
+
+from fastapi import FastAPI, Request
+
+from src.middleware import AccessLogMiddleware, access_log_listener, stream_handler
+
+from .password_hashing import percentile
+
+SCOPE = {
+    "type": "http",
+    "asgi": {"version": "3.0"},
+    "http_version": "1.1",
+    "method": "GET",
+    "scheme": "http",
+    "path": "/ping",
+    "raw_path": b"/ping",
+    "root_path": "",
+    "query_string": b"",
+    "headers": [(b"host", b"bench")],
+    "client": ("127.0.0.1", 50000),
+    "server": ("bench", 80),
+}
+
+
+class SlowSink:
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+
+    def write(self, text: str) -> int:
+        time.sleep(self.delay)
+        return len(text)
+
+    def flush(self) -> None:
+        pass
+
+
+def make_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return app
+
+
+def print_logging_app() -> FastAPI:
+    app = make_app()
+
+    # the middleware this replaced
+    @app.middleware("http")
+    async def custom_logging(request: Request, call_next):
+        start_time = time.time()
+        response = await call_next(request)
+        processing_time = time.time() - start_time
+
+        message = f"{request.client.host} - {request.client.port} - {request.method} - {request.url.path} - completed after {processing_time}s"
+
+        print(message)
+        return response
+
+    return app
+
+
+def structured_logging_app(sample_rate: float) -> FastAPI:
+    app = make_app()
+    app.add_middleware(AccessLogMiddleware, sample_rate=sample_rate)
+
+    return app
+
+
+async def drive(app, requests: int) -> dict:
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    timings = []
+
+    for _ in range(requests):
+        start = time.perf_counter_ns()
+        await app(dict(SCOPE), receive, send)
+        timings.append(time.perf_counter_ns() - start)
+
+    return {
+        "p50_us": round(percentile(timings, 50) / 1000, 1),
+        "p99_us": round(percentile(timings, 99) / 1000, 1),
+    }
+
+
+async def main(requests: int, sink_delay: float, sample_rate: float) -> None:
+    sink = SlowSink(sink_delay)
+    stream_handler.setStream(sink)
+    access_log_listener.start()
+
+    try:
+        print("none", await drive(make_app(), requests))
+
+        with contextlib.redirect_stdout(sink):
+            result = await drive(print_logging_app(), requests)
+        print("print", result)
+
+        print("structured", await drive(structured_logging_app(sample_rate), requests))
+    finally:
+        access_log_listener.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--sink-delay-ms", type=float, default=0.2)
+    parser.add_argument("--sample-rate", type=float, default=1.0)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.requests, args.sink_delay_ms / 1000, args.sample_rate))
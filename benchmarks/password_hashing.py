@@ -0,0 +1,75 @@
+"""Event-loop latency under concurrent logins, hashing inline vs on the worker pool.
+
+Run from the project root:
+
+    python -m benchmarks.password_hashing --logins 32
+"""
+import argparse
+import asyncio
+import time
+
+from src.auth.utils import pwd_context, pwd_hasher
+
+PASSWORD = "secret12"
+TICK = 0.005
+
+
+def percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+
+    return ordered[index]
+
+
+async def measure_lag(stop: asyncio.Event) -> list[float]:
+    lags = []
+
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK)
+        lags.append(time.perf_counter() - start - TICK)
+
+    return lags
+
+
+async def inline_login(pwd_hash: str) -> bool:
+    return pwd_context.verify(PASSWORD, pwd_hash)
+
+
+async def pooled_login(pwd_hash: str) -> bool:
+    return await pwd_hasher.run(pwd_context.verify, PASSWORD, pwd_hash)
+
+
+async def run(login, logins: int, pwd_hash: str) -> dict:
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_lag(stop))
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login(pwd_hash) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    lags = await ticker
+
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "loop_lag_p50_ms": round(percentile(lags, 50) * 1000, 2),
+        "loop_lag_p99_ms": round(percentile(lags, 99) * 1000, 2),
+        "loop_lag_max_ms": round(max(lags) * 1000, 2),
+    }
+
+
+async def main(logins: int) -> None:
+    pwd_hash = pwd_context.hash(PASSWORD)
+
+    for name, login in (("inline", inline_login), ("pool", pooled_login)):
+        print(name, await run(login, logins, pwd_hash))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=32)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.logins))
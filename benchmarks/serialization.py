@@ -0,0 +1,123 @@
+"""Cost of serialising a get_all_books page: FastAPI's response_model path
+against json_response, and the TypeAdapter path used before rows were
+turned into dicts. Each is driven through the ASGI app, so routing and
+response overhead is included, on the same page of --rows books.
+
+Run from the project root:
+
+    python -m benchmarks.serialization --rows 1000
+"""
+import argparse
+import asyncio
+import time
+from datetime import date, datetime, timedelta
+
+from fastapi import FastAPI, Response
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.books.models import BookPage
+from src.books.service import BookService
+from src.db.models import Book
+from src.serialization import json_response, type_adapter
+
+from .access_log import SCOPE
+from .password_hashing import percentile
+
+
+async def load_page(rows: int) -> dict:
+    engine = create_async_engine("sqlite+aiosqlite://")
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    async with AsyncSession(engine) as session:
+        start = datetime(2024, 1, 1)
+        session.add_all(
+            Book(
+                title=f"Book {i}",
+                author="Author",
+                publisher="Publisher",
+                published_date=date(2000, 1, 1),
+                page_count=100 + i,
+                language="English",
+                created_at=start + timedelta(seconds=i),
+                updated_at=start + timedelta(seconds=i),
+                review_count=3,
+                rating_sum=9,
+                rating_avg=3.0,
+                rating_histogram={2: 1, 3: 1, 4: 1},
+            )
+            for i in range(rows)
+        )
+        await session.commit()
+        page = await BookService().get_all_books(session, limit=rows)
+
+    await engine.dispose()
+
+    return page
+
+
+def make_app(page: dict) -> FastAPI:
+    app = FastAPI()
+    adapter = type_adapter(BookPage)
+
+    @app.get("/response-model", response_model=BookPage)
+    async def response_model():
+        return page
+
+    @app.get("/rows-from-attributes")
+    async def rows_from_attributes():
+        body = adapter.dump_json(adapter.validate_python(page, from_attributes=True))
+        return Response(content=body, media_type="application/json")
+
+    @app.get("/json-response")
+    async def fast():
+        return json_response(BookPage, page)
+
+    return app
+
+
+async def drive(app: FastAPI, path: str, requests: int) -> dict:
+    scope = {**SCOPE, "path": path, "raw_path": path.encode()}
+    size = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal size
+
+        if message["type"] == "http.response.body":
+            size += len(message.get("body", b""))
+
+    timings = []
+
+    for _ in range(requests):
+        start = time.perf_counter()
+        await app(dict(scope), receive, send)
+        timings.append(time.perf_counter() - start)
+
+    return {
+        "p50_ms": round(percentile(timings, 50) * 1000, 2),
+        "p99_ms": round(percentile(timings, 99) * 1000, 2),
+        "bytes": size // requests,
+    }
+
+
+async def main(rows: int, requests: int) -> None:
+    app = make_app(await load_page(rows))
+
+    for path in ("/response-model", "/rows-from-attributes", "/json-response"):
+        await drive(app, path, 3)
+        print(path, await drive(app, path, requests))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.rows, args.requests))
@@ -0,0 +1,55 @@
+"""Added indexes for hot lookups
+
+Revision ID: 5031dea5d120
+Revises: 1032d6bc1de2
+Create Date: 2026-10-18 12:05:41.208317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '5031dea5d120'
+down_revision: Union[str, Sequence[str], None] = '1032d6bc1de2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns, unique)
+INDEXES = [
+    ('ix_users_email', 'users', ['email'], True),
+    ('ix_tags_name', 'tags', ['name'], True),
+    ('ix_books_created_at_uid', 'books', ['created_at', 'uid'], False),
+    ('ix_books_user_uid_created_at_uid', 'books', ['user_uid', 'created_at', 'uid'], False),
+    ('ix_reviews_book_uid', 'reviews', ['book_uid'], False),
+    ('ix_reviews_user_uid', 'reviews', ['user_uid'], False),
+    ('ix_booktag_tag_id', 'booktag', ['tag_id'], False),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # built concurrently so large tables stay writable; this cannot run in a
+    # transaction. The unique indexes fail if duplicate emails or tag names exist.
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                unique=unique,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns, unique in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
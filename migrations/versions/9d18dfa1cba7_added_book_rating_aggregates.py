@@ -0,0 +1,77 @@
+"""Added book rating aggregates
+
+Revision ID: 9d18dfa1cba7
+Revises: 5031dea5d120
+Create Date: 2026-10-18 12:48:13.540921
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '9d18dfa1cba7'
+down_revision: Union[str, Sequence[str], None] = '5031dea5d120'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('books', sa.Column('review_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('rating_sum', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('rating_avg', sa.Float(), server_default='0', nullable=False))
+    op.add_column('books', sa.Column('rating_histogram', sa.JSON(), server_default='{}', nullable=False))
+
+    # backfill from the reviews that already exist
+    op.execute(
+        """
+        UPDATE books
+        SET review_count = totals.review_count,
+            rating_sum = totals.rating_sum,
+            rating_avg = totals.rating_sum::float / totals.review_count,
+            rating_histogram = totals.rating_histogram
+        FROM (
+            SELECT book_uid,
+                   SUM(n)::int AS review_count,
+                   SUM(rating * n)::int AS rating_sum,
+                   json_object_agg(rating, n) AS rating_histogram
+            FROM (
+                SELECT book_uid, rating, COUNT(*) AS n
+                FROM reviews
+                WHERE book_uid IS NOT NULL
+                GROUP BY book_uid, rating
+            ) AS counts
+            GROUP BY book_uid
+        ) AS totals
+        WHERE books.uid = totals.book_uid
+        """
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_books_rating_avg_uid',
+            'books',
+            ['rating_avg', 'uid'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_books_rating_avg_uid',
+            table_name='books',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+    op.drop_column('books', 'rating_histogram')
+    op.drop_column('books', 'rating_avg')
+    op.drop_column('books', 'rating_sum')
+    op.drop_column('books', 'review_count')
@@ -0,0 +1,69 @@
+"""Added book search indexes
+
+Revision ID: b3e1f47c2a90
+Revises: 9d18dfa1cba7
+Create Date: 2026-10-18 14:02:37.218406
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e1f47c2a90'
+down_revision: Union[str, Sequence[str], None] = '9d18dfa1cba7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_VECTOR = "to_tsvector('english', title || ' ' || author || ' ' || publisher)"
+SEARCH_TEXT = "lower(title || ' ' || author || ' ' || publisher)"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.execute(
+        f"ALTER TABLE books ADD COLUMN search_vector tsvector "
+        f"GENERATED ALWAYS AS ({SEARCH_VECTOR}) STORED"
+    )
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_books_search_vector',
+            'books',
+            ['search_vector'],
+            postgresql_using='gin',
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_books_search_text_trgm',
+            'books',
+            [sa.text(SEARCH_TEXT)],
+            postgresql_using='gin',
+            postgresql_ops={SEARCH_TEXT: 'gin_trgm_ops'},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_books_search_text_trgm',
+            table_name='books',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            'ix_books_search_vector',
+            table_name='books',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+
+    op.drop_column('books', 'search_vector')
@@ -0,0 +1,31 @@
+"""Made book created_at not null
+
+Revision ID: c7d2e5a18f04
+Revises: b3e1f47c2a90
+Create Date: 2026-10-18 16:02:41.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e5a18f04'
+down_revision: Union[str, Sequence[str], None] = 'b3e1f47c2a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # keyset pagination can neither encode nor compare a NULL created_at
+    op.execute("UPDATE books SET created_at = COALESCE(updated_at, now()) WHERE created_at IS NULL")
+    op.alter_column('books', 'created_at', existing_type=postgresql.TIMESTAMP(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('books', 'created_at', existing_type=postgresql.TIMESTAMP(), nullable=True)
@@ -1,19 +1,50 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from src.books.routes import book_router
 from contextlib import asynccontextmanager
-from src.db.main import init_db
+from src.db.main import init_db, replicas
 from src.auth.routes import auth_router
 from src.reviews.routes import review_router
 from src.tags.routes import tag_router
-from src.middleware import register_middleware
+from src.health import health_router
+from src.middleware import register_middleware, access_log_listener
+from src.db.redis import revoked_jtis
+from src.config import Config
+from src.mail import mail_outbox
+from src.metrics import CONTENT_TYPE, collect, flush_snapshots, registry
+import asyncio
 
 @asynccontextmanager
 async def life_span(app: FastAPI):
     print("server is starting ...")
+    access_log_listener.start()
     from src.db.models import Book
     await init_db()
+
+    background = []
+    if Config.BLOCKLIST_CACHE:
+        background.append(asyncio.create_task(revoked_jtis.listen()))
+
+    if replicas:
+        background.append(
+            asyncio.create_task(
+                replicas.monitor(Config.REPLICA_CHECK_INTERVAL, Config.REPLICA_CHECK_TIMEOUT)
+            )
+        )
+
+    if Config.METRICS and Config.METRICS_DIR:
+        background.append(
+            asyncio.create_task(
+                flush_snapshots(Config.METRICS_DIR, Config.METRICS_FLUSH_INTERVAL)
+            )
+        )
+
     yield
+
+    for task in background:
+        task.cancel()
+    mail_outbox.flush()
     print("server is stopping ...")
+    access_log_listener.stop()
 
 
 version = "1"
@@ -22,6 +53,7 @@ app = FastAPI(
     title="Bookly",
     description="A REST api for a book review system",
     version=version,
+    lifespan=life_span,
 )
 
 register_middleware(app)
@@ -29,4 +61,12 @@ register_middleware(app)
 app.include_router(book_router, prefix="/api/{version}/books", tags=["books"])
 app.include_router(auth_router, prefix="/api/{version}/auth", tags=["auth"])
 app.include_router(review_router, prefix="/api/{version}/reviews", tags=["reviews"])
-app.include_router(tag_router, prefix="/api/{version}/tags", tags=["Tags"])
\ No newline at end of file
+app.include_router(tag_router, prefix="/api/{version}/tags", tags=["Tags"])
+app.include_router(health_router, prefix="/health", tags=["health"])
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    body = await asyncio.to_thread(collect, registry.snapshot(), Config.METRICS_DIR)
+
+    return Response(content=body, media_type=CONTENT_TYPE)
@@ -0,0 +1,43 @@
+from src.auth.schemas import UserPrincipal
+from src.cache import TTLCache
+from src.config import Config
+from src.db.redis import token_blocklist
+
+# process-local copies live for USER_CACHE_TTL seconds, so other workers see an
+# update_user at most that late; the optional Redis tier is invalidated everywhere
+principal_cache = TTLCache(maxsize=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
+
+
+def redis_key(email: str) -> str:
+    return f"principal:{email}"
+
+
+async def get_cached_principal(email: str) -> UserPrincipal | None:
+    principal = principal_cache.get(email)
+
+    if principal is None and Config.USER_CACHE_REDIS:
+        raw = await token_blocklist.get(redis_key(email))
+
+        if raw is not None:
+            principal = UserPrincipal.model_validate_json(raw)
+            principal_cache.set(email, principal)
+
+    return principal
+
+
+async def cache_principal(principal: UserPrincipal) -> None:
+    principal_cache.set(principal.email, principal)
+
+    if Config.USER_CACHE_REDIS:
+        await token_blocklist.set(
+            name=redis_key(principal.email),
+            value=principal.model_dump_json(),
+            ex=Config.USER_CACHE_TTL,
+        )
+
+
+async def invalidate_principal(email: str) -> None:
+    principal_cache.delete(email)
+
+    if Config.USER_CACHE_REDIS:
+        await token_blocklist.delete(redis_key(email))
@@ -9,7 +9,7 @@ from fastapi import status
 from src.db.redis import token_in_blocklist
 from src.db.main import get_session
 from typing import List
-from src.db.models import User
+from src.auth.schemas import UserPrincipal
 
 user_service = UserService()
 
@@ -24,7 +24,7 @@ class TokenBearer(HTTPBearer):
         token = creds.credentials
 
         token_data = decode_token(token)
-        if not self.token_valid(token):
+        if token_data is None:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail={
@@ -46,15 +46,6 @@ class TokenBearer(HTTPBearer):
 
         return token_data
 
-    def token_valid(self, token: str) -> bool:
-        token_data = decode_token(token)
-
-        if token_data is not None:
-            return True
-
-        else:
-            return False
-
     def verify_token_data(self, token_data):
         raise NotImplementedError("Please override this method in child classes")
 
@@ -77,13 +68,33 @@ class RefreshTokenBearer(TokenBearer):
             )
 
 
-async def get_curr_user(
+async def get_curr_principal(
+    request: Request,
     token_details: dict = Depends(AccessTokenBearer()),
     session: AsyncSession = Depends(get_session),
-):
-    user_email = token_details["user"]["email"]
+) -> UserPrincipal:
+    # memoised on the request so every dependency and route shares one lookup
+    principal = getattr(request.state, "principal", None)
 
-    user = await user_service.get_user_by_email(user_email, session)
+    if principal is None:
+        user_email = token_details["user"]["email"]
+        principal = await user_service.get_user_principal(user_email, session)
+
+        if principal is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
+            )
+
+        request.state.principal = principal
+
+    return principal
+
+
+async def get_curr_user(
+    principal: UserPrincipal = Depends(get_curr_principal),
+    session: AsyncSession = Depends(get_session),
+):
+    user = await user_service.get_user_by_email(principal.email, session)
 
     return user
 
@@ -92,7 +103,7 @@ class RoleChecker:
     def __init__(self, allowed_roles: List[str]) -> None:
         self.allowed_roles = allowed_roles
 
-    async def __call__(self, current_user: User = Depends(get_curr_user)):
+    async def __call__(self, current_user: UserPrincipal = Depends(get_curr_principal)):
         if not current_user.is_verified:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
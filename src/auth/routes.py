@@ -18,9 +18,9 @@ from src.auth.dependencies import RefreshTokenBearer, AccessTokenBearer
 from src.db.redis import add_jti_to_blocklist
 from src.auth.dependencies import get_curr_user, RoleChecker
 from src.auth.schemas import EmailModel
-from src.mail import create_message, mail
 from src.config import Config
-from src.celery_tasks import send_email
+from src.mail import mail_outbox, send_now
+from src.serialization import json_response
 
 auth_router = APIRouter()
 user_service = UserService()
@@ -34,7 +34,7 @@ async def send_mail(emails: EmailModel):
     emails = emails.addresses
     html = "<h1>Welcome to the app</h1>"
     subject = "Welcome email"
-    send_email.delay(emails, subject, html)
+    mail_outbox.add(emails, subject, html)
     return {"message": "Email sent success"}
 
 
@@ -64,7 +64,7 @@ async def create_user_account(
     emails = [email]
     subject = "Email verification"
     
-    send_email.delay(emails, subject, html_message)
+    send_now(emails, subject, html_message)
 
 
     return {
@@ -110,7 +110,7 @@ async def login_user(
     user = await user_service.get_user_by_email(email, session)
 
     if user is not None:
-        pass_valid = verify_pwd(password, user.password_hash)
+        pass_valid = await verify_pwd(password, user.password_hash)
 
         if pass_valid:
             access_token = create_access_token(
@@ -157,7 +157,7 @@ async def refresh_token(token_details: dict = Depends(RefreshTokenBearer())):
 async def get_current_user(
     user=Depends(get_curr_user), _: bool = Depends(role_checker)
 ):
-    return user
+    return json_response(UserBookModel, user)
 
 
 @auth_router.get("/logout")
@@ -183,11 +183,7 @@ async def password_reset_request(email_data: PasswordResetRequestModel):
     <p>Please click this <a href="{link}">  link </a> to reset your password</p>
 """
 
-    message = create_message(
-        recipients=[email], subject="Email verification", body=html_message
-    )
-
-    await mail.send_message(message)
+    send_now([email], "Password reset", html_message)
 
     return JSONResponse(
         content={
@@ -213,7 +209,7 @@ async def reset_password_confrim(token: str, passwords: PasswordResetConfirm , s
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
             )
-        hash_password = generate_pwd_hash(password=passwords.new_password)
+        hash_password = await generate_pwd_hash(password=passwords.new_password)
         await user_service.update_user(user, {"password_hash": hash_password}, session)
 
         return JSONResponse(
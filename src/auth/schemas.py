@@ -25,6 +25,12 @@ class UserModel(BaseModel):
     is_verified: bool
     password_hash: str = Field(exclude=True)
     
+class UserPrincipal(BaseModel):
+    uid: uuid.UUID
+    email: str
+    role: str
+    is_verified: bool
+
 class UserBookModel(UserModel):
     books: List[BookCreateModel]
     reviews: List[ReviewModel]
@@ -1,8 +1,9 @@
 from src.db.models import User
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlmodel import select
-from src.auth.schemas import UserCreateModel
+from src.auth.schemas import UserCreateModel, UserPrincipal
 from src.auth.utils import generate_pwd_hash
+from src.auth.cache import get_cached_principal, cache_principal, invalidate_principal
 
 
 class UserService:
@@ -15,6 +16,27 @@ class UserService:
 
         return user
 
+    async def get_user_principal(self, email: str, session: AsyncSession):
+        principal = await get_cached_principal(email)
+
+        if principal is not None:
+            return principal
+
+        statement = select(User.uid, User.email, User.role, User.is_verified).where(
+            User.email == email
+        )
+
+        result = await session.exec(statement)
+        row = result.first()
+
+        if row is None:
+            return None
+
+        principal = UserPrincipal.model_validate(row, from_attributes=True)
+        await cache_principal(principal)
+
+        return principal
+
     async def user_exists(self, email: str, session: AsyncSession):
         user = await self.get_user_by_email(email, session)
 
@@ -28,7 +50,7 @@ class UserService:
 
         new_user = User(**user_data_dict)
 
-        new_user.password_hash = generate_pwd_hash(user_data_dict["password"])
+        new_user.password_hash = await generate_pwd_hash(user_data_dict["password"])
         new_user.role = "user"
         session.add(new_user)
 
@@ -41,5 +63,6 @@ class UserService:
             setattr(user, k, v)
 
         await session.commit()
+        await invalidate_principal(user.email)
 
         return user
\ No newline at end of file
@@ -1,11 +1,19 @@
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
 from datetime import timedelta, datetime
+import asyncio
 import jwt
 from src.config import Config
+from src.cache import TTLCache
 import uuid
+import time
+import hashlib
 import logging
 from itsdangerous import URLSafeTimedSerializer
 
+logger = logging.getLogger(__name__)
+
 pwd_context = CryptContext(
     schemes=['bcrypt_sha256'],
     deprecated="auto"
@@ -13,14 +21,46 @@ pwd_context = CryptContext(
 
 ACCESS_TOKEN_EXPIRY = 3600
 
-def generate_pwd_hash(password: str)->str:
-    hash = pwd_context.hash(password)
+# verified claims keyed by token digest, each kept until the token expires
+token_cache = TTLCache(maxsize=Config.TOKEN_CACHE_SIZE, ttl=ACCESS_TOKEN_EXPIRY)
+
+class PasswordHasher:
+    """Runs bcrypt off the event loop on a fixed pool with a bounded backlog"""
+
+    def __init__(self, workers: int, max_pending: int) -> None:
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwd-hash")
+        self.max_pending = workers + max_pending
+        self.pending = 0
+
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pending += 1
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+
+
+pwd_hasher = PasswordHasher(
+    workers=Config.PASSWORD_HASH_WORKERS, max_pending=Config.PASSWORD_HASH_QUEUE_SIZE
+)
+
+
+async def generate_pwd_hash(password: str)->str:
+    hash = await pwd_hasher.run(pwd_context.hash, password)
 
     return hash
 
 
-def verify_pwd(password: str, pwd_hash: str)->bool:
-    return pwd_context.verify(password, pwd_hash)
+async def verify_pwd(password: str, pwd_hash: str)->bool:
+    return await pwd_hasher.run(pwd_context.verify, password, pwd_hash)
 
 def create_access_token(user_data: dict, expiry: timedelta = None, refresh: bool = False):
     payload = {}
@@ -38,18 +78,28 @@ def create_access_token(user_data: dict, expiry: timedelta = None, refresh: bool
     return token
 
 def decode_token(token: str):
+    key = hashlib.sha256(token.encode()).digest()
+    token_data = token_cache.get(key)
+
+    if token_data is not None:
+        return token_data
+
     try:
         token_data = jwt.decode(
         jwt=token,
         key=Config.JWT_SECRET_KEY,
         algorithms=Config.JWT_ALGORITHM
     )
-        return token_data
-    
+
     except jwt.PyJWTError as e:
-        logging.exception(e)
+        # no traceback: a flood of bad tokens should stay cheap to reject
+        logger.debug("Invalid token: %s", e)
         return None
 
+    token_cache.set(key, token_data, ttl=token_data["exp"] - time.time())
+
+    return token_data
+
 
 serializer = URLSafeTimedSerializer(
         secret_key=Config.JWT_SECRET_KEY,
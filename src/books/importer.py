@@ -0,0 +1,119 @@
+"""Parse JSON Lines or CSV book catalogues into records for BookService.import_books"""
+from typing import AsyncIterable, AsyncIterator, Iterable
+import csv
+
+JSONL = "jsonl"
+CSV = "csv"
+
+MAX_RECORD_LENGTH = 64 * 1024
+
+
+class RejectedRecord(ValueError):
+    """Yielded in place of a record that can't be read, e.g. one longer than
+    MAX_RECORD_LENGTH, so the import reports that row and carries on"""
+
+
+def too_long(max_length: int) -> RejectedRecord:
+    return RejectedRecord(f"Record longer than {max_length} characters")
+
+
+def decode_line(line: bytes) -> str | RejectedRecord:
+    try:
+        return line.decode()
+    except UnicodeDecodeError:
+        return RejectedRecord("Record is not valid UTF-8")
+
+
+def detect_format(content_type: str | None) -> str:
+    if content_type and "csv" in content_type:
+        return CSV
+
+    return JSONL
+
+
+async def iter_lines(
+    chunks: AsyncIterable[bytes], max_length: int = MAX_RECORD_LENGTH
+) -> AsyncIterator[str | RejectedRecord]:
+    """Split a byte stream into lines, holding at most one partial line of
+    up to max_length bytes. A longer line is skipped up to its newline."""
+    buffer = b""
+    skipping = False
+
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+
+        for line in lines:
+            if skipping:
+                skipping = False
+            elif len(line) > max_length:
+                yield too_long(max_length)
+            else:
+                yield decode_line(line)
+
+        if len(buffer) > max_length:
+            if not skipping:
+                yield too_long(max_length)
+
+            buffer = b""
+            skipping = True
+
+    if buffer and not skipping:
+        yield decode_line(buffer)
+
+
+async def iter_records(
+    lines: AsyncIterable[str | RejectedRecord], fmt: str, max_length: int = MAX_RECORD_LENGTH
+) -> AsyncIterator[str | dict | RejectedRecord]:
+    """Yield one record per data row: the raw JSON text, or a dict for CSV.
+
+    A CSV record continues onto the next line while it has an unclosed
+    quote, so quoted fields may contain newlines.
+    """
+    header = None
+    pending: list[str] = []
+    pending_length = 0
+    quotes = 0
+
+    async for line in lines:
+        if isinstance(line, RejectedRecord):
+            pending, pending_length, quotes = [], 0, 0
+            yield line
+            continue
+
+        if not pending and not line.strip():
+            continue
+
+        if fmt == JSONL:
+            yield line
+            continue
+
+        pending.append(line + "\n")
+        pending_length += len(line) + 1
+        quotes += line.count('"')
+
+        if pending_length > max_length:
+            pending, pending_length, quotes = [], 0, 0
+            yield too_long(max_length)
+            continue
+
+        # an odd number of quotes so far leaves a quoted field open
+        if quotes % 2:
+            continue
+
+        values = next(csv.reader(pending))
+        pending, pending_length, quotes = [], 0, 0
+
+        if header is None:
+            header = values
+            continue
+
+        yield dict(zip(header, values))
+
+    if pending:
+        yield RejectedRecord("Unterminated quoted field")
+
+
+async def aiter_sync(items: Iterable):
+    for item in items:
+        yield item
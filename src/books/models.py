@@ -1,7 +1,8 @@
 from pydantic import BaseModel
 import uuid
 from datetime import datetime, date
-from typing import List
+from typing import Dict, List, Optional
+from enum import Enum
 from src.reviews.schemas import ReviewModel
 
 class Book(BaseModel):
@@ -14,10 +15,22 @@ class Book(BaseModel):
     language: str
     created_at: datetime
     updated_at: datetime
+    review_count: int
+    rating_sum: int
+    rating_avg: float
+    rating_histogram: Dict[int, int]
 
 class BookDetailModel(Book):
     reviews: List[ReviewModel]
 
+class BookSort(str, Enum):
+    newest = "newest"
+    rating = "rating"
+
+class BookPage(BaseModel):
+    books: List[Book]
+    next_cursor: Optional[str] = None
+
 class BookCreateModel(BaseModel):
     title: str
     author: str
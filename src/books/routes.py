@@ -1,11 +1,20 @@
-from fastapi import status, HTTPException, APIRouter, Depends
-from src.books.models import Book, BookCreateModel, BookUpdateModel, BookDetailModel
-from src.db.main import get_session
+from fastapi import status, HTTPException, APIRouter, Depends, Query, Request
+from src.books.models import Book, BookCreateModel, BookUpdateModel, BookDetailModel, BookPage, BookSort
+from src.db.main import get_read_session, get_session
+from src.db.replicas import on_replica
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.books.service import BookService
+from src.books.service import BookService, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from uuid import UUID
 from src.auth.dependencies import AccessTokenBearer
 from src.auth.dependencies import RoleChecker
+from src.db.models import Book as BookTable
+from src.books.importer import detect_format, iter_lines, iter_records
+from src.export import ExportFormat, MEDIA_TYPES, encode_rows
+from fastapi.responses import StreamingResponse
+from src.conditional import is_not_modified, not_modified, validator_headers
+from src.response_cache import response_cache, book_namespace, BOOKS
+from src.serialization import json_response
+from src.errors import InvalidCursor
 
 book_router = APIRouter()
 book_service = BookService()
@@ -13,24 +22,48 @@ access_token_bearer = AccessTokenBearer()
 role_checker = RoleChecker(["admin", "user"])
 
 
-@book_router.get("", response_model=list[Book], status_code=status.HTTP_200_OK)
+async def book_page(page):
+    try:
+        return await page
+    except InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+@book_router.get("", response_model=BookPage, status_code=status.HTTP_200_OK)
 async def get_all_books(
-    session: AsyncSession = Depends(get_session),
+    request: Request,
+    cursor: str | None = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    sort: BookSort = BookSort.newest,
+    session: AsyncSession = Depends(get_read_session),
     token_details: dict = Depends(access_token_bearer),
     _: bool = Depends(role_checker),
 ):
-    print(token_details)
-    return await book_service.get_all_books(session)
-
-@book_router.get("/user/{user_uid}", response_model=list[Book], status_code=status.HTTP_200_OK)
+    return await response_cache.respond(
+        request,
+        [BOOKS],
+        BookPage,
+        lambda: book_page(book_service.get_all_books(session, cursor, limit, sort)),
+        replica=on_replica(session),
+    )
+
+@book_router.get("/user/{user_uid}", response_model=BookPage, status_code=status.HTTP_200_OK)
 async def get_user_book_submissions(
+    request: Request,
     user_uid: str,
-    session: AsyncSession = Depends(get_session),
+    cursor: str | None = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_read_session),
     token_details: dict = Depends(access_token_bearer),
     _: bool = Depends(role_checker),
 ):
-    print(token_details)
-    return await book_service.get_user_books(user_uid, session)
+    return await response_cache.respond(
+        request,
+        [BOOKS],
+        BookPage,
+        lambda: book_page(book_service.get_user_books(user_uid, session, cursor, limit)),
+        replica=on_replica(session),
+    )
 
 
 
@@ -42,26 +75,99 @@ async def create_book(
     _: bool = Depends(role_checker),
 ):
     user_id = token_details["user"]["user_uid"]
-    return await book_service.create_book(newBook, user_id, session)
+    new_book = await book_service.create_book(newBook, user_id, session)
+
+    return json_response(Book, new_book, status_code=status.HTTP_201_CREATED)
+
+
+@book_router.post("/import", status_code=status.HTTP_200_OK)
+async def import_books(
+    request: Request,
+    session: AsyncSession = Depends(get_session),
+    token_details: dict = Depends(access_token_bearer),
+    _: bool = Depends(role_checker),
+):
+    """Bulk import a JSON Lines body, or CSV with a text/csv content type"""
+    user_uid = UUID(token_details["user"]["user_uid"])
+    fmt = detect_format(request.headers.get("content-type"))
+    records = iter_records(iter_lines(request.stream()), fmt)
+
+    return await book_service.import_books(records, user_uid, session)
+
+
+@book_router.get("/search", response_model=BookPage, status_code=status.HTTP_200_OK)
+async def search_books(
+    request: Request,
+    q: str = Query(min_length=2, max_length=200),
+    cursor: str | None = None,
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_read_session),
+    token_details: dict = Depends(access_token_bearer),
+    _: bool = Depends(role_checker),
+):
+    return await response_cache.respond(
+        request,
+        [BOOKS],
+        BookPage,
+        lambda: book_page(book_service.search_books(q, session, cursor, limit)),
+        replica=on_replica(session),
+    )
+
+
+@book_router.get("/export", status_code=status.HTTP_200_OK)
+async def export_books(
+    format: ExportFormat = ExportFormat.ndjson,
+    session: AsyncSession = Depends(get_read_session),
+    token_details: dict = Depends(access_token_bearer),
+    _: bool = Depends(role_checker),
+):
+    rows = encode_rows(book_service.stream_books(session), Book, format)
+
+    return StreamingResponse(rows, media_type=MEDIA_TYPES[format])
 
 
 @book_router.get("/{book_uid}", response_model=BookDetailModel, status_code=status.HTTP_200_OK)
 async def get_book_by_id(
+    request: Request,
     book_uid: UUID,
-    session: AsyncSession = Depends(get_session),
+    session: AsyncSession = Depends(get_read_session),
     token_details: dict = Depends(access_token_bearer),
     _: bool = Depends(role_checker),
 ):
-    book_found = await book_service.get_book(book_uid, session)
-
-    if book_found:
-        return book_found
+    version = await book_service.get_book_version(book_uid, session)
 
-    else:
+    if version is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
         )
 
+    etag, last_modified = version
+
+    # answered before the book and its reviews are loaded
+    if is_not_modified(request, etag, last_modified):
+        return not_modified(validator_headers(etag, last_modified))
+
+    async def find_book():
+        book_found = await book_service.get_book(book_uid, session, BookTable.reviews)
+
+        if book_found:
+            return book_found
+
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
+            )
+
+    return await response_cache.respond(
+        request,
+        [book_namespace(book_uid)],
+        BookDetailModel,
+        find_book,
+        etag=etag,
+        last_modified=last_modified,
+        replica=on_replica(session),
+    )
+
 
 @book_router.patch("/{book_uid}", status_code=status.HTTP_200_OK)
 async def edit_book(
@@ -0,0 +1,51 @@
+"""Seed the database with books from the command line
+
+    python -m src.books.seed catalogue.jsonl
+    python -m src.books.seed catalogue.csv --user-uid <uid>
+    python -m src.books.seed --sample
+"""
+from src.books.book_data import books
+from src.books.importer import CSV, JSONL, aiter_sync, iter_records
+from src.books.service import BookService
+from src.db.main import Session, engine
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import uuid
+
+
+async def import_records(records, args) -> dict:
+    async with Session() as session:
+        return await BookService().import_books(
+            records, args.user_uid, session, chunk_size=args.chunk_size
+        )
+
+
+async def main(args) -> None:
+    if args.sample:
+        report = await import_records(aiter_sync(books), args)
+    else:
+        path = Path(args.path)
+        fmt = CSV if path.suffix == ".csv" else JSONL
+
+        with path.open() as f:
+            lines = aiter_sync(line.rstrip("\n") for line in f)
+            report = await import_records(iter_records(lines, fmt), args)
+
+    await engine.dispose()
+    print(json.dumps(report, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import books")
+    parser.add_argument("path", nargs="?", help="a .jsonl or .csv file")
+    parser.add_argument("--sample", action="store_true", help="seed from src/books/book_data.py")
+    parser.add_argument("--user-uid", type=uuid.UUID, default=None)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if not args.sample and not args.path:
+        parser.error("a path or --sample is required")
+
+    asyncio.run(main(args))
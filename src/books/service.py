@@ -1,23 +1,157 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
 from src.books.models import BookCreateModel, BookUpdateModel
+from src.books.models import Book as BookModel, BookSort
+from src.books.utils import encode_cursor, decode_cursor, prefix_tsquery
+from src.books.importer import RejectedRecord
 from sqlmodel import select, desc
-from src.db.models import Book
+from sqlalchemy import tuple_, insert, func, literal, literal_column
+from sqlalchemy.exc import SQLAlchemyError
+from pydantic import ValidationError
+from typing import AsyncIterable
+from sqlalchemy.orm import raiseload, selectinload
+from src.db.models import Book, Review, BOOK_SEARCH_TEXT
+from src.export import EXPORT_BATCH_SIZE
+from src.response_cache import response_cache, book_namespace, BOOKS
+from src.conditional import weak_etag
+from src.errors import InvalidCursor
 from datetime import datetime
+import uuid
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+IMPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+# keyset pagination walks (key, uid) so deep pages cost the same as the first
+SORT_KEYS = {
+    BookSort.newest: (Book.created_at, datetime),
+    BookSort.rating: (Book.rating_avg, float),
+}
+
+# list endpoints only fetch the columns the Book response model serialises,
+# so none of the selectin relationships on the table model are triggered
+BOOK_LIST_COLUMNS = [getattr(Book, field) for field in BookModel.model_fields]
 
 
 class BookService:
-    async def get_all_books(self, session: AsyncSession):
-        statement = select(Book).order_by(desc(Book.created_at))
+    async def get_all_books(
+        self,
+        session: AsyncSession,
+        cursor: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        sort: BookSort = BookSort.newest,
+    ):
+        statement = select(*BOOK_LIST_COLUMNS)
+
+        return await self.paginate(statement, cursor, limit, session, *SORT_KEYS[sort])
+
+    async def search_books(
+        self,
+        q: str,
+        session: AsyncSession,
+        cursor: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ):
+        """Rank books by full-text match, falling back to trigram similarity
+        when no word matches so that typos still find something"""
+        tsquery = prefix_tsquery(q)
+
+        if tsquery is None:
+            return {"books": [], "next_cursor": None}
+
+        search_vector = literal_column("books.search_vector")
+        query = func.to_tsquery("english", tsquery)
+        condition = search_vector.op("@@")(query)
+
+        # a single GIN probe; the fuzzy match is far less selective so it is
+        # only paid for when the exact one finds nothing
+        if await session.scalar(select(Book.uid).where(condition).limit(1)):
+            rank = func.ts_rank_cd(search_vector, query, 1)
+        else:
+            search_text = literal_column(BOOK_SEARCH_TEXT)
+            term = literal(q.lower())
+            condition = term.op("<%")(search_text)
+            rank = func.word_similarity(term, search_text)
+
+        rank = rank.label("rank")
+        statement = select(*BOOK_LIST_COLUMNS, rank).where(condition)
+
+        return await self.paginate(statement, cursor, limit, session, rank, float)
+
+    async def paginate(
+        self,
+        statement,
+        cursor: str | None,
+        limit: int,
+        session: AsyncSession,
+        key=Book.created_at,
+        key_type: type = datetime,
+    ):
+        if cursor is not None:
+            position = decode_cursor(cursor, key_type)
+
+            if position is None:
+                raise InvalidCursor()
+
+            statement = statement.where(tuple_(key, Book.uid) < position)
+
+        statement = statement.order_by(desc(key), desc(Book.uid)).limit(limit + 1)
 
         result = await session.exec(statement)
+        books = result.all()
+
+        next_cursor = None
+        if len(books) > limit:
+            books = books[:limit]
+            last = books[-1]
+            next_cursor = encode_cursor(getattr(last, key.key), last.uid)
+
+        return {"books": books, "next_cursor": next_cursor}
+
+    async def get_book(
+        self, book_uid: str, session: AsyncSession, *relationships, for_update: bool = False
+    ):
+        # relationships are only loaded when the caller asks for them, e.g. Book.reviews
+        statement = (
+            select(Book)
+            .where(Book.uid == book_uid)
+            .options(*[selectinload(rel) for rel in relationships], raiseload("*"))
+        )
 
-        return result.all()
+        if for_update:
+            statement = statement.with_for_update(of=Book)
 
-    async def get_book(self, book_uid: str, session: AsyncSession):
-        statement = select(Book).where(Book.uid == book_uid)
         result = await session.exec(statement)
         return result.first()
 
+    async def get_book_version(self, book_uid: str, session: AsyncSession):
+        """(etag, last_modified) for a book's detail view, without loading it.
+
+        Review count is included as deleting an older review leaves the
+        newest review timestamp unchanged.
+        """
+        statement = (
+            select(Book.updated_at, Book.review_count, func.max(Review.updated_at))
+            .outerjoin(Review, Review.book_uid == Book.uid)
+            .where(Book.uid == book_uid)
+            .group_by(Book.uid)
+        )
+
+        result = await session.exec(statement)
+        row = result.first()
+
+        if row is None:
+            return None
+
+        updated_at, review_count, reviews_updated_at = row
+        last_modified = max(updated_at, reviews_updated_at or updated_at)
+
+        return (
+            weak_etag(book_uid, updated_at.isoformat(), review_count, last_modified.isoformat()),
+            last_modified,
+        )
+
     async def create_book(
         self, book_data: BookCreateModel, user_uid: str, session: AsyncSession
     ):
@@ -29,6 +163,7 @@ class BookService:
 
         session.add(new_book)
         await session.commit()
+        await response_cache.invalidate(BOOKS)
 
         return new_book
 
@@ -44,29 +179,132 @@ class BookService:
                 setattr(book_to_update, k, v)
 
             await session.commit()
+            await response_cache.invalidate(BOOKS, book_namespace(book_uid))
 
             return book_to_update
 
         return None
 
     async def delete_book(self, book_uid: str, session: AsyncSession):
-        book_to_delete = await self.get_book(book_uid, session)
+        # reviews and tag links must be loaded so the unit of work can detach them
+        book_to_delete = await self.get_book(
+            book_uid, session, Book.reviews, Book.tags
+        )
 
         if book_to_delete:
             await session.delete(book_to_delete)
             await session.commit()
+            await response_cache.invalidate(BOOKS, book_namespace(book_uid))
 
             return "Book deletion success"
 
         return None
 
-    async def get_user_books(self, user_uid: str, session: AsyncSession):
+    async def get_user_books(
+        self,
+        user_uid: str,
+        session: AsyncSession,
+        cursor: str | None = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+    ):
+        statement = select(*BOOK_LIST_COLUMNS).where(Book.user_uid == user_uid)
+
+        return await self.paginate(statement, cursor, limit, session)
+
+    async def import_books(
+        self,
+        records: AsyncIterable[str | dict | RejectedRecord],
+        user_uid: uuid.UUID | None,
+        session: AsyncSession,
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+    ):
+        """Validate and insert books chunk by chunk.
+
+        A record is raw JSON text or a dict. Rows the importer rejected, that
+        fail validation, or that the database rejects, are reported and
+        skipped without aborting the import.
+        """
+        report = {"imported": 0, "failed": 0, "errors": []}
+        chunk = []
+        row = 0
+
+        async for record in records:
+            row += 1
+
+            if isinstance(record, RejectedRecord):
+                self.report_error(report, row, str(record))
+                continue
+
+            try:
+                if isinstance(record, str):
+                    book_data = BookCreateModel.model_validate_json(record)
+                else:
+                    book_data = BookCreateModel.model_validate(record)
+
+            except ValidationError as e:
+                self.report_error(
+                    report, row, e.errors(include_url=False, include_input=False)
+                )
+                continue
+
+            chunk.append((row, {**book_data.model_dump(), "user_uid": user_uid}))
+
+            if len(chunk) >= chunk_size:
+                await self.insert_chunk(chunk, session, report)
+                chunk = []
+
+        if chunk:
+            await self.insert_chunk(chunk, session, report)
+
+        if report["imported"]:
+            await response_cache.invalidate(BOOKS)
+
+        return report
+
+    async def insert_chunk(self, chunk: list, session: AsyncSession, report: dict):
+        try:
+            # executemany, which SQLAlchemy batches into multi-row INSERTs
+            await session.exec(insert(Book), params=[values for _, values in chunk])
+            await session.commit()
+            report["imported"] += len(chunk)
+
+        except SQLAlchemyError:
+            await session.rollback()
+            await self.insert_rows(chunk, session, report)
+
+    async def insert_rows(self, chunk: list, session: AsyncSession, report: dict):
+        """Insert a chunk the database rejected one row per savepoint, so
+        only the offending rows are reported"""
+        imported = 0
+
+        for row, values in chunk:
+            try:
+                async with session.begin_nested():
+                    await session.exec(insert(Book), params=[values])
+
+                imported += 1
+
+            except SQLAlchemyError as e:
+                self.report_error(report, row, str(getattr(e, "orig", e)))
+
+        await session.commit()
+        report["imported"] += imported
+
+    def report_error(self, report: dict, row: int, errors):
+        report["failed"] += 1
+
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row, "errors": errors})
+
+    async def stream_books(self, session: AsyncSession):
+        """Yield every book in batches from a server-side cursor"""
         statement = (
-            select(Book)
-            .where(Book.user_uid == user_uid)
-            .order_by(desc(Book.created_at))
+            select(*BOOK_LIST_COLUMNS)
+            .order_by(desc(Book.created_at), desc(Book.uid))
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
         )
 
-        result = await session.exec(statement)
+        result = await session.stream(statement)
 
-        return result.all()
+        async for partition in result.partitions():
+            yield partition
@@ -0,0 +1,41 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+import uuid
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(key: datetime | float, uid: uuid.UUID) -> str:
+    if isinstance(key, datetime):
+        key = key.isoformat()
+
+    raw = f"{key}|{uid}".encode()
+
+    return urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, key_type: type = datetime):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        key, uid = urlsafe_b64decode(padded).decode().split("|")
+        parse = datetime.fromisoformat if key_type is datetime else key_type
+
+        return parse(key), uuid.UUID(uid)
+
+    except Exception as e:
+        # the caller answers 400, so a bad cursor is the client's problem
+        logger.debug("Invalid cursor: %s", e)
+        return None
+
+
+def prefix_tsquery(q: str) -> str | None:
+    """AND the words of a search box query together, the last one as a prefix
+    so results show up while the user is still typing"""
+    words = re.findall(r"\w+", q.lower())
+
+    if not words:
+        return None
+
+    return " & ".join(words[:-1] + [f"{words[-1]}:*"])
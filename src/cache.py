@@ -0,0 +1,58 @@
+from collections import OrderedDict
+from typing import Any, Hashable
+import time
+
+
+class TTLCache:
+    """A bounded LRU mapping whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+
+        if item is None:
+            return default
+
+        expires_at, value = item
+
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def purge(self) -> None:
+        """Drop expired entries from the least recently used end, up to the
+        first live one. Entries that are never read again otherwise stay
+        until evicted, and count towards len()."""
+        now = time.monotonic()
+
+        while self._data:
+            expires_at, _ = next(iter(self._data.values()))
+
+            if expires_at > now:
+                break
+
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -1,15 +1,97 @@
-from celery import Celery
-from src.mail import create_message, mail
-from asgiref.sync import async_to_sync
+from celery import Celery, signals
+from collections import defaultdict
+from src.config import Config
+from src.mail import SMTPConnection, create_message
+from src.metrics import CELERY_TASKS_ENQUEUED
+import logging
+import smtplib
+
+logger = logging.getLogger(__name__)
 
 c_app = Celery()
 
 c_app.config_from_object("src.config")
 
+# opened lazily, so each forked worker process gets its own session
+smtp = SMTPConnection()
+
+
+@signals.after_task_publish.connect
+def count_enqueued(sender=None, **kwargs):
+    # sender is the task name; this runs in the publishing (web) process
+    CELERY_TASKS_ENQUEUED.inc(sender)
+
+
+@signals.worker_process_shutdown.connect
+@signals.worker_shutdown.connect
+def close_smtp(**kwargs):
+    smtp.close()
+
 
 @c_app.task()
 def send_email(recipients: list[str], subject: str, html_message: str):
-    message = create_message(recipients=recipients, subject=subject, body=html_message)
+    # kept so messages queued before batching was introduced still go out
+    smtp.send(create_message(recipients, subject, html_message))
+
+
+def envelopes(messages: list[dict]) -> dict[tuple, list[dict]]:
+    """Messages grouped by recipient domain and then by identical content.
+    Each group is sent as one SMTP transaction with several RCPT TOs."""
+    groups = defaultdict(list)
+
+    for message in messages:
+        domain = message["to"].rpartition("@")[2].lower()
+        groups[(domain, message["subject"], message["html"])].append(message)
+
+    return dict(sorted(groups.items()))
+
+
+def is_transient(code: int | None) -> bool:
+    # no code means the connection failed, which is worth another try
+    return code is None or 400 <= code < 500
+
+
+@c_app.task()
+def send_email_batch(messages: list[dict]) -> dict:
+    """Sends a batch over the worker's SMTP session. Recipients refused with a
+    4xx code are retried with backoff up to MAIL_MAX_RETRIES times, and
+    recipients refused with a 5xx code are reported and dropped."""
+    failed, retry = {}, []
+    sent = 0
+
+    for (_, subject, html), group in envelopes(messages).items():
+        recipients = [message["to"] for message in group]
+        # a coalesced copy must not disclose its other recipients
+        message = create_message(recipients if len(recipients) == 1 else [], subject, html)
+
+        try:
+            refused = smtp.send(message, recipients)
+        except smtplib.SMTPRecipientsRefused as e:
+            refused = e.recipients
+        except (smtplib.SMTPException, OSError) as e:
+            smtp.close()
+            code = getattr(e, "smtp_code", None)
+            refused = {recipient: (code, str(e)) for recipient in recipients}
+
+        for message in group:
+            if message["to"] not in refused:
+                sent += 1
+                continue
+
+            code, reason = refused[message["to"]]
+            reason = reason.decode(errors="replace") if isinstance(reason, bytes) else reason
+            failed[message["to"]] = [code, reason]
+            attempt = message.get("attempt", 0)
+
+            if is_transient(code) and attempt < Config.MAIL_MAX_RETRIES:
+                retry.append({**message, "attempt": attempt + 1})
+            else:
+                logger.warning("Giving up on mail to %s: %s %s", message["to"], code, reason)
+
+    if retry:
+        attempt = max(message["attempt"] for message in retry)
+        send_email_batch.apply_async(
+            (retry,), countdown=Config.MAIL_RETRY_DELAY * 2 ** (attempt - 1)
+        )
 
-    async_to_sync(mail.send_message)(message)
-    print("Email sent")
+    return {"sent": sent, "failed": failed, "retrying": len(retry)}
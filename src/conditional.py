@@ -0,0 +1,63 @@
+"""Validators and conditional GET handling (RFC 9110 section 13)"""
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response, status
+import hashlib
+
+
+def weak_etag(*parts) -> str:
+    digest = hashlib.blake2b(
+        "|".join(str(part) for part in parts).encode(), digest_size=16
+    ).hexdigest()
+
+    return f'W/"{digest}"'
+
+
+def body_etag(body: bytes) -> str:
+    return f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def as_utc(value: datetime) -> datetime:
+    # naive timestamps come from datetime.now(), i.e. server local time
+    return value.astimezone(timezone.utc)
+
+
+def validator_headers(etag: str, last_modified: datetime | None = None) -> dict:
+    headers = {"ETag": etag}
+
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(as_utc(last_modified), usegmt=True)
+
+    return headers
+
+
+def is_not_modified(
+    request: Request, etag: str, last_modified: datetime | None = None
+) -> bool:
+    """If-None-Match wins when both are sent; ETags compare weakly"""
+    if_none_match = request.headers.get("if-none-match")
+
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+
+        opaque = etag.removeprefix("W/")
+        candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+        return opaque in candidates
+
+    if_modified_since = request.headers.get("if-modified-since")
+
+    if if_modified_since is None or last_modified is None:
+        return False
+
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+    return as_utc(last_modified).replace(microsecond=0) <= as_utc(since)
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
@@ -0,0 +1,125 @@
+"""Opt-in per-request SQL statistics.
+
+Cursor events on every Engine record into the QueryStats of the current
+request (a context variable set by QueryStatsMiddleware), so statements
+issued outside a request cost a single lookup. A SELECT of the same shape
+repeated SQL_N_PLUS_ONE_THRESHOLD times in one request is reported as a
+likely N+1, e.g. a lazy or selectin relationship loaded once per row.
+"""
+from collections import Counter
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+import logging
+import re
+import time
+
+logger = logging.getLogger("bookly.sql")
+
+PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|\$\d+|%\(\w+\)s)\s*,?)+\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Statement text with IN lists of any length collapsed, so a query run
+    for 3 and for 30 ids counts as the same shape"""
+    return PLACEHOLDER_LIST.sub("(...)", WHITESPACE.sub(" ", statement).strip())
+
+
+class QueryStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.duration_ns = 0
+        self.shapes: Counter[str] = Counter()
+
+    def record(self, statement: str, duration_ns: int) -> None:
+        self.count += 1
+        self.duration_ns += duration_ns
+        self.shapes[statement_shape(statement)] += 1
+
+    @property
+    def duration_ms(self) -> float:
+        return self.duration_ns / 1_000_000
+
+    def duplicates(self) -> dict[str, int]:
+        return {shape: n for shape, n in self.shapes.items() if n > 1}
+
+    def n_plus_one(self, threshold: int) -> dict[str, int]:
+        return {
+            shape: n
+            for shape, n in self.shapes.items()
+            if n >= threshold and shape.upper().startswith("SELECT")
+        }
+
+
+current_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_stats.get() is not None:
+        context.query_start = time.perf_counter_ns()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_stats.get()
+    start = getattr(context, "query_start", None)
+
+    if stats is not None and start is not None:
+        stats.record(statement, time.perf_counter_ns() - start)
+
+
+def install(target=Engine) -> None:
+    """Time statements on `target`, every Engine by default"""
+    if not event.contains(target, "before_cursor_execute", before_cursor_execute):
+        event.listen(target, "before_cursor_execute", before_cursor_execute)
+        event.listen(target, "after_cursor_execute", after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """Adds a Server-Timing header with the request's query count and DB
+    time, logs the totals and warns about likely N+1 query patterns"""
+
+    def __init__(self, app, n_plus_one_threshold: int = 5) -> None:
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        token = current_stats.set(stats)
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                timing = f'db;dur={stats.duration_ms:.2f};desc="{stats.count} queries"'
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", timing.encode()),
+                ]
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_stats.reset(token)
+            self.report(scope, stats)
+
+    def report(self, scope, stats: QueryStats) -> None:
+        if not stats.count:
+            return
+
+        route = getattr(scope.get("route"), "path", scope["path"])
+
+        logger.info(
+            "%s %s: %d queries in %.2fms, %d repeated shapes",
+            scope["method"],
+            route,
+            stats.count,
+            stats.duration_ms,
+            len(stats.duplicates()),
+        )
+
+        for shape, n in stats.n_plus_one(self.n_plus_one_threshold).items():
+            logger.warning("Possible N+1 in %s %s: %d x %s", scope["method"], route, n, shape)
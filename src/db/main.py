@@ -1,24 +1,201 @@
+from fastapi import Request
 from sqlmodel import SQLModel
-from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy import event, make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from src.config import Config
+from src.metrics import registry, DB_POOL_CHECKOUT_WAIT, DB_POOL_CHECKOUT_TIMEOUTS
+from src.db.instrumentation import install as install_instrumentation
+from src.db.replicas import ReplicaSet, is_disconnect, pin_to_primary, pinned_to_primary, request_user_uid
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlalchemy.orm import sessionmaker
+from pathlib import Path
+import asyncio
+import logging
+import time
 
-engine = create_async_engine(
-    Config.DATABASE_URL,
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+class PoolStats:
+    """Connection checkout counters used to size the pool"""
+
+    def __init__(self) -> None:
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float) -> None:
+        self.checkouts += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        DB_POOL_CHECKOUT_WAIT.observe(wait)
+
+        if wait > Config.DB_POOL_TIMEOUT / 2:
+            logger.warning("Waited %.3fs for a database connection", wait)
+
+    def snapshot(self, pool) -> dict:
+        return {
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_seconds": self.total_wait / self.checkouts if self.checkouts else 0.0,
+            "max_wait_seconds": self.max_wait,
+        }
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def connect(self):
+        start = time.perf_counter()
+
+        try:
+            connection = super().connect()
+        except PoolTimeoutError:
+            pool_stats.timeouts += 1
+            DB_POOL_CHECKOUT_TIMEOUTS.inc()
+            raise
+
+        pool_stats.record(time.perf_counter() - start)
+
+        return connection
+
+
+def make_engine(url: str):
+    connect_args = {}
+
+    # statement caching is an asyncpg feature, other drivers reject the arguments
+    if make_url(url).get_driver_name() == "asyncpg":
+        connect_args = {
+            "prepared_statement_cache_size": Config.DB_STATEMENT_CACHE_SIZE,
+            "statement_cache_size": Config.DB_STATEMENT_CACHE_SIZE,
+        }
+
+    engine = create_async_engine(
+        url,
+        poolclass=TimedQueuePool,
+        pool_size=Config.DB_POOL_SIZE,
+        max_overflow=Config.DB_MAX_OVERFLOW,
+        pool_timeout=Config.DB_POOL_TIMEOUT,
+        pool_recycle=Config.DB_POOL_RECYCLE,
+        pool_pre_ping=Config.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+    if Config.SQL_INSTRUMENTATION:
+        install_instrumentation(engine.sync_engine)
+
+    return engine
+
+
+engine = make_engine(Config.DATABASE_URL)
+replicas = ReplicaSet(
+    [make_engine(url) for url in Config.DATABASE_REPLICA_URLS],
+    eject_seconds=Config.REPLICA_EJECT_SECONDS,
 )
 
+for name, documentation, read in (
+    ("bookly_db_pool_size", "Database pool size", lambda: engine.pool.size()),
+    ("bookly_db_pool_checked_out", "Database connections in use", lambda: engine.pool.checkedout()),
+    ("bookly_db_pool_overflow", "Database connections over the pool size", lambda: engine.pool.overflow()),
+):
+    registry.gauge(name, documentation, function=read)
+
+# built once and shared by every request
+Session = async_sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
 async def init_db():
-    async with engine.begin() as connection:
-        await connection.run_sync(SQLModel.metadata.create_all)
-
-async def get_session()->AsyncSession:
-    Session = sessionmaker(
-        bind=engine,
-        class_=AsyncSession,
-        expire_on_commit=False
+    if Config.DB_CREATE_ALL:
+        async with engine.begin() as connection:
+            await connection.run_sync(SQLModel.metadata.create_all)
+    else:
+        await check_migrations()
+
+    if Config.DB_POOL_WARM:
+        await warm_pool(Config.DB_POOL_WARM)
+
+
+async def check_migrations(bind=engine) -> None:
+    """Raises unless the database is at the Alembic head revision"""
+    from alembic.config import Config as AlembicConfig
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    heads = set(ScriptDirectory.from_config(AlembicConfig(ALEMBIC_INI)).get_heads())
+
+    async with bind.connect() as connection:
+        current = await connection.run_sync(
+            lambda sync: set(MigrationContext.configure(sync).get_current_heads())
+        )
+
+    if current != heads:
+        raise RuntimeError(
+            f"Database is at revision {sorted(current) or 'none'}, expected {sorted(heads)}; "
+            "run `alembic upgrade head`"
+        )
+
+
+async def warm_pool(size: int) -> None:
+    """Opens up to DB_POOL_SIZE connections at once, so early requests don't
+    each pay for a connection handshake"""
+    connections = await asyncio.gather(
+        *(engine.connect() for _ in range(min(size, Config.DB_POOL_SIZE)))
     )
 
+    for connection in connections:
+        await connection.close()
+
+
+@event.listens_for(AsyncSession.sync_session_class, "after_commit")
+def pin_writer(session):
+    user_uid = session.info.get("user_uid")
+
+    if user_uid is not None:
+        pin_to_primary(user_uid)
+
+
+async def get_session(request: Request) -> AsyncSession:
     async with Session() as session:
+        if replicas:
+            session.sync_session.info["user_uid"] = request_user_uid(request)
+
         yield session
 
+
+async def get_read_session(request: Request) -> AsyncSession:
+    """A session on a replica for read-only routes, or on the primary when
+    there are none, all are ejected, or the user has just written"""
+    read_engine = None
+
+    if replicas:
+        user_uid = request_user_uid(request)
+
+        if user_uid is None or not await pinned_to_primary(user_uid):
+            read_engine = replicas.choose()
+
+    if read_engine is None:
+        async with Session() as session:
+            yield session
+        return
+
+    async with Session(bind=read_engine) as session:
+        session.sync_session.info["replica"] = True
+
+        try:
+            yield session
+        except Exception as e:
+            if is_disconnect(e):
+                replicas.eject(read_engine)
+            raise
+
+
+def get_pool_stats() -> dict:
+    return pool_stats.snapshot(engine.pool)
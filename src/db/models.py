@@ -1,5 +1,7 @@
-from sqlmodel import SQLModel, Field, Column, Relationship
+from sqlmodel import SQLModel, Field, Column, Relationship, Index
 import sqlalchemy.dialects.postgresql as pg
+import sqlalchemy as sa
+from sqlalchemy import DDL, event
 from datetime import datetime, date
 import uuid
 from typing import Optional
@@ -7,10 +9,18 @@ from typing import List
 
 class BookTag(SQLModel, table=True):
     book_uid: uuid.UUID = Field(default=None, foreign_key="books.uid", primary_key=True)
-    tag_id: uuid.UUID = Field(default=None, foreign_key="tags.uid", primary_key=True)
+    tag_id: uuid.UUID = Field(
+        default=None, foreign_key="tags.uid", primary_key=True, index=True
+    )
 
 class Book(SQLModel, table=True):
     __tablename__ = "books"
+    __table_args__ = (
+        # keyset pagination walks (created_at, uid), optionally per user
+        Index("ix_books_created_at_uid", "created_at", "uid"),
+        Index("ix_books_user_uid_created_at_uid", "user_uid", "created_at", "uid"),
+        Index("ix_books_rating_avg_uid", "rating_avg", "uid"),
+    )
 
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
@@ -22,8 +32,26 @@ class Book(SQLModel, table=True):
     page_count: int
     language: str
     user_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="users.uid")
-    created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
-    updated_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    created_at: datetime = Field(
+        sa_column=Column(pg.TIMESTAMP, nullable=False, default=datetime.now)
+    )
+    updated_at: datetime = Field(
+        sa_column=Column(pg.TIMESTAMP, default=datetime.now, onupdate=datetime.now)
+    )
+    # rating aggregates, kept in step with reviews by ReviewService
+    review_count: int = Field(
+        default=0, sa_column=Column(sa.Integer, nullable=False, server_default="0")
+    )
+    rating_sum: int = Field(
+        default=0, sa_column=Column(sa.Integer, nullable=False, server_default="0")
+    )
+    rating_avg: float = Field(
+        default=0, sa_column=Column(sa.Float, nullable=False, server_default="0")
+    )
+    rating_histogram: dict = Field(
+        default_factory=dict,
+        sa_column=Column(sa.JSON, nullable=False, server_default="{}"),
+    )
     user: Optional["User"] = Relationship(
         back_populates="books", sa_relationship_kwargs={"lazy": "selectin"}
     )
@@ -39,6 +67,22 @@ class Book(SQLModel, table=True):
         return f"<Book {self.title}>"
 
 
+# Full-text search is Postgres only, so the generated tsvector column and the
+# GIN / trigram indexes over it are not mapped and are created by DDL instead
+BOOK_SEARCH_VECTOR = "to_tsvector('english', title || ' ' || author || ' ' || publisher)"
+BOOK_SEARCH_TEXT = "lower(title || ' ' || author || ' ' || publisher)"
+
+for ddl in (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"ALTER TABLE books ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({BOOK_SEARCH_VECTOR}) STORED",
+    "CREATE INDEX ix_books_search_vector ON books USING gin (search_vector)",
+    f"CREATE INDEX ix_books_search_text_trgm ON books USING gin (({BOOK_SEARCH_TEXT}) gin_trgm_ops)",
+):
+    event.listen(
+        Book.__table__, "after_create", DDL(ddl).execute_if(dialect="postgresql")
+    )
+
+
 class User(SQLModel, table=True):
     __tablename__ = "users"
 
@@ -46,7 +90,7 @@ class User(SQLModel, table=True):
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
     username: str
-    email: str
+    email: str = Field(unique=True, index=True)
     first_name: str
     last_name: str
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
@@ -75,10 +119,16 @@ class Review(SQLModel, table=True):
     )
     rating: int = Field(lt=5)
     review_text: str
-    book_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="books.uid")
-    user_uid: Optional[uuid.UUID] = Field(default=None, foreign_key="users.uid")
+    book_uid: Optional[uuid.UUID] = Field(
+        default=None, foreign_key="books.uid", index=True
+    )
+    user_uid: Optional[uuid.UUID] = Field(
+        default=None, foreign_key="users.uid", index=True
+    )
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
-    updated_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
+    updated_at: datetime = Field(
+        sa_column=Column(pg.TIMESTAMP, default=datetime.now, onupdate=datetime.now)
+    )
     user: Optional["User"] = Relationship(back_populates="reviews")
     book: Optional["Book"] = Relationship(back_populates="reviews")
 
@@ -92,7 +142,9 @@ class Tag(SQLModel, table=True):
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, primary_key=True, default=uuid.uuid4)
     )
-    name: str = Field(sa_column=Column(pg.VARCHAR, nullable=False))
+    name: str = Field(
+        sa_column=Column(pg.VARCHAR, nullable=False, unique=True, index=True)
+    )
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     books: List["Book"] = Relationship(
         back_populates="tags",
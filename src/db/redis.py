@@ -1,15 +1,135 @@
 from redis import asyncio as aioredis
+from redis.exceptions import RedisError
+from src.cache import TTLCache
 from src.config import Config
+from src.metrics import BLOCKLIST_REDIS_DURATION, BLOCKLIST_LOOKUPS
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
 
 JTI_EXPIRY = 3600
 
+REVOKED_CHANNEL = "blocklist:revoked"
+REVOKED_INDEX = "blocklist:index"
+REVOKED_INDEX_SINCE = "blocklist:index:since"
+
 token_blocklist = aioredis.from_url(Config.REDIS_URL)
 
 
+class RevokedJtiCache:
+    """In-process copy of the blocklist, kept in sync over Redis pub/sub.
+
+    While the subscription is known to be live (heard from within
+    BLOCKLIST_MAX_STALENESS seconds) a JTI that is not in the local set is
+    treated as not revoked without asking Redis. Otherwise callers fall back
+    to a direct lookup.
+    """
+
+    def __init__(self, maxsize: int, max_staleness: float) -> None:
+        self.revoked = TTLCache(maxsize=maxsize, ttl=JTI_EXPIRY)
+        self.max_staleness = max_staleness
+        self.synced_at: float | None = None
+        # revocations made before the index existed are only in plain keys
+        self.complete_at: float | None = None
+
+    def add(self, jti: str, ttl: float = JTI_EXPIRY) -> None:
+        self.revoked.set(jti, True, ttl=ttl)
+
+    def __contains__(self, jti: str) -> bool:
+        return self.revoked.get(jti, False)
+
+    def fresh(self) -> bool:
+        # revoked JTIs are rarely looked up again, so expire them here
+        self.revoked.purge()
+
+        return (
+            self.synced_at is not None
+            and self.complete_at is not None
+            and time.time() >= self.complete_at
+            and time.monotonic() - self.synced_at <= self.max_staleness
+            and len(self.revoked) < self.revoked.maxsize
+        )
+
+    async def bootstrap(self) -> None:
+        now = time.time()
+
+        await token_blocklist.set(REVOKED_INDEX_SINCE, now, nx=True)
+        since = float(await token_blocklist.get(REVOKED_INDEX_SINCE))
+        self.complete_at = since + JTI_EXPIRY
+
+        await token_blocklist.zremrangebyscore(REVOKED_INDEX, "-inf", now)
+        entries = await token_blocklist.zrange(REVOKED_INDEX, 0, -1, withscores=True)
+
+        for jti, expires_at in entries:
+            self.add(jti.decode(), ttl=expires_at - now)
+
+    async def listen(self) -> None:
+        while True:
+            pubsub = token_blocklist.pubsub()
+
+            try:
+                # subscribe before loading the index so no revocation slips between them
+                await pubsub.subscribe(REVOKED_CHANNEL)
+                await self.bootstrap()
+                self.synced_at = time.monotonic()
+
+                while True:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True, timeout=self.max_staleness / 4
+                    )
+
+                    if message is None:
+                        if time.monotonic() - self.synced_at > self.max_staleness / 2:
+                            await pubsub.ping()
+                        continue
+
+                    if message["type"] == "message":
+                        self.add(message["data"].decode())
+
+                    self.synced_at = time.monotonic()
+
+            except (RedisError, OSError) as e:
+                self.synced_at = None
+                logger.warning("Blocklist subscription lost: %s", e)
+                await asyncio.sleep(1)
+
+            finally:
+                await pubsub.aclose()
+
+
+revoked_jtis = RevokedJtiCache(
+    maxsize=Config.BLOCKLIST_CACHE_SIZE, max_staleness=Config.BLOCKLIST_MAX_STALENESS
+)
+
+
 async def add_jti_to_blocklist(jti: str) -> None:
-    await token_blocklist.set(name=jti, value="", ex=JTI_EXPIRY)
+    start = time.perf_counter()
+
+    async with token_blocklist.pipeline(transaction=True) as pipe:
+        pipe.set(name=jti, value="", ex=JTI_EXPIRY)
+        pipe.zadd(REVOKED_INDEX, {jti: time.time() + JTI_EXPIRY})
+        pipe.publish(REVOKED_CHANNEL, jti)
+        await pipe.execute()
+
+    BLOCKLIST_REDIS_DURATION.observe(time.perf_counter() - start, "add")
+
+    revoked_jtis.add(jti)
 
 
 async def token_in_blocklist(jti: str) -> bool:
+    if jti in revoked_jtis:
+        BLOCKLIST_LOOKUPS.inc("local")
+        return True
+
+    if revoked_jtis.fresh():
+        BLOCKLIST_LOOKUPS.inc("local")
+        return False
+
+    BLOCKLIST_LOOKUPS.inc("redis")
+    start = time.perf_counter()
     jti = await token_blocklist.get(jti)
+    BLOCKLIST_REDIS_DURATION.observe(time.perf_counter() - start, "lookup")
+
     return jti is not None
@@ -0,0 +1,130 @@
+"""Read replica selection and read-your-writes pinning.
+
+Read-only routes take their session from get_read_session, which picks
+replicas round-robin. A replica that fails a connection, or the periodic
+SELECT 1 in ReplicaSet.monitor, is ejected for REPLICA_EJECT_SECONDS, and
+reads fall back to the primary while every replica is out.
+
+A user whose request committed is pinned to the primary for
+READ_YOUR_WRITES_SECONDS, so they never read their own write back from a
+lagging replica. The pin is set when the transaction commits rather than
+when the request ends, since FastAPI only runs the tail of a dependency
+after the response has gone out. Pins are per worker unless
+READ_YOUR_WRITES_REDIS shares them through Redis.
+"""
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from src.auth.utils import decode_token
+from src.cache import TTLCache
+from src.config import Config
+from src.db.redis import token_blocklist
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+recent_writers = TTLCache(maxsize=100000, ttl=Config.READ_YOUR_WRITES_SECONDS)
+
+# fire-and-forget Redis writes, referenced until they finish
+pending_pins: set[asyncio.Task] = set()
+
+
+def redis_key(user_uid: str) -> str:
+    return f"primary-pin:{user_uid}"
+
+
+def is_disconnect(error: BaseException) -> bool:
+    return isinstance(error, OSError) or (
+        isinstance(error, DBAPIError) and error.connection_invalidated
+    )
+
+
+def on_replica(session) -> bool:
+    """Whether get_read_session put this session on a replica"""
+    return session.sync_session.info.get("replica", False)
+
+
+def request_user_uid(request) -> str | None:
+    """The user behind a bearer token, or None. The token is verified again
+    by the route's own auth dependency; decode_token caches the claims."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+
+    if scheme.lower() != "bearer" or not token:
+        return None
+
+    token_data = decode_token(token)
+
+    return token_data["user"]["user_uid"] if token_data else None
+
+
+def pin_to_primary(user_uid: str) -> None:
+    recent_writers.set(user_uid, True)
+
+    if Config.READ_YOUR_WRITES_REDIS:
+        task = asyncio.get_running_loop().create_task(
+            token_blocklist.set(
+                redis_key(user_uid), 1, px=int(Config.READ_YOUR_WRITES_SECONDS * 1000)
+            )
+        )
+        pending_pins.add(task)
+        task.add_done_callback(pending_pins.discard)
+
+
+async def pinned_to_primary(user_uid: str) -> bool:
+    if recent_writers.get(user_uid):
+        return True
+
+    if Config.READ_YOUR_WRITES_REDIS:
+        return bool(await token_blocklist.exists(redis_key(user_uid)))
+
+    return False
+
+
+class ReplicaSet:
+    def __init__(self, engines: list, eject_seconds: float) -> None:
+        self.engines = engines
+        self.eject_seconds = eject_seconds
+        self.ejected_until: dict = {}
+        self.turn = 0
+
+    def __bool__(self) -> bool:
+        return bool(self.engines)
+
+    def choose(self):
+        """The next replica in turn that is not ejected, or None"""
+        now = time.monotonic()
+
+        for _ in range(len(self.engines)):
+            engine = self.engines[self.turn % len(self.engines)]
+            self.turn += 1
+
+            if self.ejected_until.get(engine, 0) <= now:
+                return engine
+
+        return None
+
+    def eject(self, engine) -> None:
+        if self.ejected_until.get(engine, 0) <= time.monotonic():
+            logger.warning("Ejecting read replica %s", engine.url.render_as_string())
+
+        self.ejected_until[engine] = time.monotonic() + self.eject_seconds
+
+    def readmit(self, engine) -> None:
+        self.ejected_until.pop(engine, None)
+
+    async def check(self, engine, timeout: float) -> None:
+        try:
+            async with asyncio.timeout(timeout):
+                async with engine.connect() as connection:
+                    await connection.execute(text("SELECT 1"))
+        except Exception as e:
+            logger.warning("Read replica check failed: %s", e)
+            self.eject(engine)
+        else:
+            self.readmit(engine)
+
+    async def monitor(self, interval: float, timeout: float) -> None:
+        while True:
+            await asyncio.gather(*(self.check(engine, timeout) for engine in self.engines))
+            await asyncio.sleep(interval)
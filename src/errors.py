@@ -74,6 +74,12 @@ class UserNotFound(BooklyException):
     pass
 
 
+class InvalidCursor(BooklyException):
+    """User has provided a pagination cursor that can't be decoded"""
+
+    pass
+
+
 class AccountNotVerified(Exception):
     """Account not yet verified"""
 
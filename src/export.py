@@ -0,0 +1,53 @@
+from enum import Enum
+from typing import AsyncIterable, AsyncIterator, Sequence
+from pydantic import BaseModel
+import csv
+import io
+import json
+
+EXPORT_BATCH_SIZE = 1000
+
+
+class ExportFormat(str, Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
+MEDIA_TYPES = {
+    ExportFormat.ndjson: "application/x-ndjson",
+    ExportFormat.csv: "text/csv",
+}
+
+
+async def encode_rows(
+    partitions: AsyncIterable[Sequence],
+    model: type[BaseModel],
+    fmt: ExportFormat,
+) -> AsyncIterator[str]:
+    """Serialise batches of rows through `model`, one chunk of output per batch"""
+    fields = list(model.model_fields)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    if fmt == ExportFormat.csv:
+        writer.writerow(fields)
+
+    async for rows in partitions:
+        for row in rows:
+            item = model.model_validate(row, from_attributes=True)
+
+            if fmt == ExportFormat.ndjson:
+                buffer.write(item.model_dump_json())
+                buffer.write("\n")
+            else:
+                writer.writerow(
+                    json.dumps(value) if isinstance(value, (dict, list)) else value
+                    for value in item.model_dump(mode="json").values()
+                )
+
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    if fmt == ExportFormat.csv and buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,115 @@
+"""Liveness and readiness probes.
+
+/health/live only shows that the event loop is serving requests.
+/health/ready checks Postgres, Redis and the Celery broker concurrently,
+each bounded by HEALTH_PROBE_TIMEOUT, and reuses the result for
+HEALTH_CACHE_TTL seconds, so load balancers polling every worker cost one
+round of checks per interval rather than one per probe.
+"""
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from functools import lru_cache
+from redis import asyncio as aioredis
+from sqlalchemy import text
+from src.config import Config, broker_url
+from src.db.main import engine
+from src.db.redis import token_blocklist
+import asyncio
+import time
+
+health_router = APIRouter()
+
+
+async def check_database() -> None:
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+async def check_redis() -> None:
+    await token_blocklist.ping()
+
+
+@lru_cache
+def broker_client() -> aioredis.Redis:
+    # a client of its own, in case the broker is moved off the cache's Redis
+    return aioredis.from_url(broker_url)
+
+
+async def check_broker() -> None:
+    await broker_client().ping()
+
+
+async def probe(check, timeout: float) -> dict:
+    start = time.perf_counter()
+    error = None
+
+    try:
+        await asyncio.wait_for(check(), timeout)
+    except asyncio.TimeoutError:
+        error = f"timed out after {timeout}s"
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    result = {"ok": error is None, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+    if error:
+        result["error"] = error
+
+    return result
+
+
+class ReadinessCheck:
+    def __init__(self, checks: dict, timeout: float, ttl: float) -> None:
+        self.checks = checks
+        self.timeout = timeout
+        self.ttl = ttl
+        self.result: dict | None = None
+        self.checked_at = 0.0
+        self.running: asyncio.Future | None = None
+
+    async def run(self) -> dict:
+        results = await asyncio.gather(
+            *(probe(check, self.timeout) for check in self.checks.values())
+        )
+
+        return {
+            "ready": all(result["ok"] for result in results),
+            "checks": dict(zip(self.checks, results)),
+        }
+
+    async def refresh(self) -> dict:
+        try:
+            self.result = await self.run()
+            self.checked_at = time.monotonic()
+            return self.result
+        finally:
+            self.running = None
+
+    async def get(self) -> dict:
+        if self.result is not None and time.monotonic() - self.checked_at < self.ttl:
+            return self.result
+
+        # probes arriving while a check is in flight wait for that one
+        if self.running is None:
+            self.running = asyncio.ensure_future(self.refresh())
+
+        return await asyncio.shield(self.running)
+
+
+readiness = ReadinessCheck(
+    {"database": check_database, "redis": check_redis, "broker": check_broker},
+    timeout=Config.HEALTH_PROBE_TIMEOUT,
+    ttl=Config.HEALTH_CACHE_TTL,
+)
+
+
+@health_router.get("/live")
+async def live():
+    return {"status": "ok"}
+
+
+@health_router.get("/ready")
+async def ready():
+    result = await readiness.get()
+
+    return JSONResponse(content=result, status_code=200 if result["ready"] else 503)
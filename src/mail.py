@@ -1,30 +1,185 @@
-from fastapi_mail import FastMail, ConnectionConfig, MessageSchema, MessageType
+from email.message import EmailMessage
+from email.utils import formataddr, formatdate, make_msgid
+from functools import lru_cache
 from src.config import Config
-from pathlib import Path
+import asyncio
+import logging
+import smtplib
+import ssl
 
+logger = logging.getLogger(__name__)
 
-BASE_DIR = Path(__file__).resolve().parent
 
-mail_config = ConnectionConfig(
-    MAIL_USERNAME=Config.MAIL_USERNAME,
-    MAIL_PASSWORD=Config.MAIL_PASSWORD,
-    MAIL_PORT=Config.MAIL_PORT,
-    MAIL_SERVER=Config.MAIL_SERVER,
-    MAIL_STARTTLS=Config.MAIL_STARTTLS,
-    MAIL_SSL_TLS=Config.MAIL_SSL_TLS,
-    MAIL_FROM=Config.MAIL_FROM,
-    MAIL_FROM_NAME=Config.MAIL_FROM_NAME,
-    USE_CREDENTIALS=Config.USE_CREDENTIALS,
-    VALIDATE_CERTS=Config.VALIDATE_CERTS,
-    TEMPLATE_FOLDER=Path(BASE_DIR, "templates"),
-)
+@lru_cache
+def mail_config():
+    # fastapi_mail pulls in jinja2, dnspython and httpx, which only workers need
+    from fastapi_mail import ConnectionConfig
 
-mail = FastMail(config=mail_config)
+    return ConnectionConfig(
+        MAIL_USERNAME=Config.MAIL_USERNAME,
+        MAIL_PASSWORD=Config.MAIL_PASSWORD,
+        MAIL_PORT=Config.MAIL_PORT,
+        MAIL_SERVER=Config.MAIL_SERVER,
+        MAIL_STARTTLS=Config.MAIL_STARTTLS,
+        MAIL_SSL_TLS=Config.MAIL_SSL_TLS,
+        MAIL_FROM=Config.MAIL_FROM,
+        MAIL_FROM_NAME=Config.MAIL_FROM_NAME,
+        USE_CREDENTIALS=Config.USE_CREDENTIALS,
+        VALIDATE_CERTS=Config.VALIDATE_CERTS,
+    )
 
 
-def create_message(recipients: list[str], subject: str, body: str):
-    message = MessageSchema(
-        recipients=recipients, subject=subject, body=body, subtype=MessageType.html
-    )
+def create_message(recipients: list[str], subject: str, body: str) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((Config.MAIL_FROM_NAME, Config.MAIL_FROM))
+    message["To"] = ", ".join(recipients) or "undisclosed-recipients:;"
+    message["Subject"] = subject
+    message["Date"] = formatdate(localtime=True)
+    message["Message-ID"] = make_msgid()
+    message.set_content(body, subtype="html")
 
     return message
+
+
+class SMTPConnection:
+    """A long-lived SMTP session for one worker process. It connects and logs
+    in on first use and reconnects once if the server has dropped it since."""
+
+    def __init__(self) -> None:
+        self.smtp: smtplib.SMTP | None = None
+
+    @property
+    def config(self):
+        return mail_config()
+
+    def tls_context(self) -> ssl.SSLContext:
+        context = ssl.create_default_context()
+
+        if not self.config.VALIDATE_CERTS:
+            context.check_hostname = False
+            context.verify_mode = ssl.CERT_NONE
+
+        return context
+
+    def connect(self) -> smtplib.SMTP:
+        config = self.config
+
+        if config.MAIL_SSL_TLS:
+            smtp = smtplib.SMTP_SSL(
+                config.MAIL_SERVER,
+                config.MAIL_PORT,
+                timeout=config.TIMEOUT,
+                context=self.tls_context(),
+            )
+        else:
+            smtp = smtplib.SMTP(config.MAIL_SERVER, config.MAIL_PORT, timeout=config.TIMEOUT)
+
+            if config.MAIL_STARTTLS:
+                smtp.starttls(context=self.tls_context())
+
+        if config.USE_CREDENTIALS:
+            smtp.login(config.MAIL_USERNAME, config.MAIL_PASSWORD.get_secret_value())
+
+        return smtp
+
+    def send(self, message: EmailMessage, to_addrs: list[str] | None = None) -> dict:
+        """Returns the refused recipients, as smtplib's send_message does"""
+        if self.smtp is None:
+            self.smtp = self.connect()
+
+        try:
+            return self.smtp.send_message(message, to_addrs=to_addrs)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # servers close idle sessions, so a stale one is expected now and then
+            self.smtp = self.connect()
+            return self.smtp.send_message(message, to_addrs=to_addrs)
+
+    def close(self) -> None:
+        if self.smtp is None:
+            return
+
+        try:
+            self.smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+
+        self.smtp = None
+
+
+def mail_messages(recipients: list[str], subject: str, html_message: str) -> list[dict]:
+    return [
+        {"to": recipient, "subject": subject, "html": html_message}
+        for recipient in recipients
+    ]
+
+
+def send_now(recipients: list[str], subject: str, html_message: str) -> None:
+    """Hands mail to the broker before returning, for messages the user is
+    told have been sent. A broker error fails the request instead of losing
+    the mail with the process."""
+    from src.celery_tasks import send_email_batch
+
+    send_email_batch.delay(mail_messages(recipients, subject, html_message))
+
+
+class MailOutbox:
+    """Collects bulk mail in the web process and publishes it as one
+    send_email_batch task per MAIL_BATCH_SIZE messages, or whatever has
+    accumulated after MAIL_BATCH_WINDOW seconds. Queued mail is lost if the
+    process dies inside the window, so transactional mail uses send_now."""
+
+    def __init__(self, batch_size: int, window: float) -> None:
+        self.batch_size = batch_size
+        self.window = window
+        self.pending: list[dict] = []
+        self.timer: asyncio.TimerHandle | None = None
+
+    def add(self, recipients: list[str], subject: str, html_message: str) -> None:
+        self.pending.extend(mail_messages(recipients, subject, html_message))
+
+        # full batches go out now, a remainder waits for the window
+        while len(self.pending) >= self.batch_size:
+            self.publish()
+
+        if self.pending and self.timer is None:
+            try:
+                self.schedule()
+            except RuntimeError:
+                self.flush()
+
+    def schedule(self) -> None:
+        self.timer = asyncio.get_running_loop().call_later(self.window, self.flush_due)
+
+    def flush_due(self) -> None:
+        self.timer = None
+
+        try:
+            self.flush()
+        except Exception:
+            # nothing would report an error raised in a loop callback
+            logger.exception(
+                "Publishing %d queued messages failed, retrying in %ss",
+                len(self.pending),
+                self.window,
+            )
+            self.schedule()
+
+    def publish(self) -> None:
+        # the Celery app is only set up once there is something to send
+        from src.celery_tasks import send_email_batch
+
+        batch = self.pending[: self.batch_size]
+        send_email_batch.delay(batch)
+        # only dropped once published, so a broker error keeps them for the next flush
+        del self.pending[: len(batch)]
+
+    def flush(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        while self.pending:
+            self.publish()
+
+
+mail_outbox = MailOutbox(Config.MAIL_BATCH_SIZE, Config.MAIL_BATCH_WINDOW)
@@ -0,0 +1,308 @@
+"""Prometheus metrics kept in plain per-process dicts.
+
+Every update happens on the event loop thread, so counters are bumped
+without locks. With METRICS_DIR set, each worker periodically writes a
+snapshot to `<METRICS_DIR>/<pid>.json` and a scrape of any worker merges
+them all: counters and histograms are summed over every file, gauges only
+over workers that are still running.
+"""
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable
+import asyncio
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.values: dict[tuple, float | list] = {}
+
+    def samples(self) -> list:
+        # copied, as snapshots are serialised off the event loop thread
+        return [
+            [list(labels), list(value) if isinstance(value, list) else value]
+            for labels, value in self.values.items()
+        ]
+
+    def describe(self) -> dict:
+        return {
+            "type": self.type,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": self.samples(),
+        }
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, *args, function: Callable[[], float] | None = None, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.function = function
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.values[labels] = self.values.get(labels, 0) - amount
+
+    def set(self, value: float, *labels) -> None:
+        self.values[labels] = value
+
+    def samples(self) -> list:
+        if self.function is not None:
+            return [[[], self.function()]]
+
+        return super().samples()
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, *args, buckets: tuple = DEFAULT_BUCKETS, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels) -> None:
+        # per bucket (not cumulative) counts, then +Inf, then the sum
+        counts = self.values.get(labels)
+
+        if counts is None:
+            counts = self.values[labels] = [0] * (len(self.buckets) + 2)
+
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def describe(self) -> dict:
+        return {**super().describe(), "buckets": list(self.buckets)}
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        return self.register(Counter(*args, **kwargs))
+
+    def gauge(self, *args, **kwargs) -> Gauge:
+        return self.register(Gauge(*args, **kwargs))
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        return self.register(Histogram(*args, **kwargs))
+
+    def snapshot(self) -> dict:
+        return {name: metric.describe() for name, metric in self.metrics.items()}
+
+
+def merge(snapshots: list[dict], live: list[bool]) -> dict:
+    merged: dict[str, dict] = {}
+
+    for snapshot, alive in zip(snapshots, live):
+        for name, metric in snapshot.items():
+            if metric["type"] == "gauge" and not alive:
+                continue
+
+            target = merged.setdefault(name, {**metric, "samples": {}})
+
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                current = target["samples"].get(key)
+
+                if current is None:
+                    target["samples"][key] = value
+                elif isinstance(value, list):
+                    target["samples"][key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target["samples"][key] = current + value
+
+    for metric in merged.values():
+        metric["samples"] = [[list(k), v] for k, v in metric["samples"].items()]
+
+    return merged
+
+
+def format_labels(names, values, extra: str = "") -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+        for name, value in zip(names, values)
+    ]
+
+    if extra:
+        pairs.append(extra)
+
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render(snapshot: dict) -> str:
+    lines = []
+
+    for name, metric in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        names = metric["labelnames"]
+
+        for labels, value in metric["samples"]:
+            if metric["type"] != "histogram":
+                lines.append(f"{name}{format_labels(names, labels)} {value}")
+                continue
+
+            cumulative = 0
+            bounds = [str(b) for b in metric["buckets"]] + ["+Inf"]
+
+            for bound, count in zip(bounds, value[:-1]):
+                cumulative += count
+                le = format_labels(names, labels, f'le="{bound}"')
+                lines.append(f"{name}_bucket{le} {cumulative}")
+
+            lines.append(f"{name}_sum{format_labels(names, labels)} {value[-1]}")
+            lines.append(f"{name}_count{format_labels(names, labels)} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    "bookly_http_requests_total", "HTTP requests", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "bookly_http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+HTTP_IN_FLIGHT = registry.gauge(
+    "bookly_http_requests_in_flight", "HTTP requests being served", ("method",)
+)
+DB_POOL_CHECKOUT_WAIT = registry.histogram(
+    "bookly_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a database connection",
+    buckets=FAST_BUCKETS,
+)
+DB_POOL_CHECKOUT_TIMEOUTS = registry.counter(
+    "bookly_db_pool_checkout_timeouts_total", "Database connection checkouts that timed out"
+)
+BLOCKLIST_REDIS_DURATION = registry.histogram(
+    "bookly_blocklist_redis_seconds",
+    "Latency of Redis calls made for the token blocklist",
+    ("operation",),
+    buckets=FAST_BUCKETS,
+)
+BLOCKLIST_LOOKUPS = registry.counter(
+    "bookly_blocklist_lookups_total",
+    "Token blocklist lookups by where they were answered",
+    ("source",),
+)
+CELERY_TASKS_ENQUEUED = registry.counter(
+    "bookly_celery_tasks_enqueued_total", "Celery tasks published", ("task",)
+)
+
+
+class MetricsMiddleware:
+    """Counts and times HTTP requests by templated route"""
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        method = scope["method"]
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_IN_FLIGHT.dec(method)
+
+            # raw paths would give one series per book uid
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.inc(method, route, str(status_code))
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, method, route)
+
+
+def snapshot_path(directory: str, pid: int) -> Path:
+    return Path(directory) / f"{pid}.json"
+
+
+def write_snapshot(directory: str, snapshot: dict) -> None:
+    path = snapshot_path(directory, os.getpid())
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(snapshot))
+    os.replace(tmp, path)
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def collect(snapshot: dict, directory: str | None = None) -> str:
+    """Exposition text for this worker's snapshot, or merged with those of
+    every worker sharing `directory`"""
+    if directory is None:
+        return render(snapshot)
+
+    write_snapshot(directory, snapshot)
+    snapshots, live = [], []
+
+    for path in Path(directory).glob("*.json"):
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+
+        live.append(pid_alive(int(path.stem)))
+
+    return render(merge(snapshots, live))
+
+
+async def flush_snapshots(directory: str, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+
+        try:
+            await asyncio.to_thread(write_snapshot, directory, registry.snapshot())
+        except OSError as e:
+            logger.warning("Could not write metrics snapshot: %s", e)
@@ -1,26 +1,131 @@
 from fastapi import FastAPI
-from fastapi.requests import Request
-import time
+from logging.handlers import QueueHandler, QueueListener
+from src.config import Config
+from src.metrics import MetricsMiddleware
+from src.db.instrumentation import QueryStatsMiddleware
+import json
 import logging
+import queue
+import random
+import sys
+import time
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 
 logger = logging.getLogger("uvicorn.access")
 logger.disabled = True
 
+access_logger = logging.getLogger("bookly.access")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **getattr(record, "fields", {}),
+        }
+
+        return json.dumps(entry, default=str)
+
+
+class DroppingQueueHandler(QueueHandler):
+    """Never blocks the caller: records are handed over as they are, for the
+    listener thread to format, and dropped when the queue is full"""
+
+    def __init__(self, queue: queue.Queue) -> None:
+        super().__init__(queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+access_queue: queue.Queue = queue.Queue(maxsize=Config.ACCESS_LOG_QUEUE_SIZE)
+access_handler = DroppingQueueHandler(access_queue)
+
+access_logger.addHandler(access_handler)
+access_logger.setLevel(logging.INFO)
+access_logger.propagate = False
+
+stream_handler = logging.StreamHandler(sys.stdout)
+stream_handler.setFormatter(JsonFormatter())
+
+# started and stopped with the app, see life_span
+access_log_listener = QueueListener(access_queue, stream_handler)
+
+
+class AccessLogMiddleware:
+    """Logs one JSON record per HTTP request once the response is complete.
+
+    Successful requests are sampled at `sample_rate`; server errors are
+    always logged.
+    """
+
+    def __init__(self, app, sample_rate: float = 1.0) -> None:
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter_ns()
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            if status_code >= 500 or random.random() < self.sample_rate:
+                self.log(scope, status_code, time.perf_counter_ns() - start)
+
+    def log(self, scope, status_code: int, duration_ns: int) -> None:
+        route = scope.get("route")
+        client = scope.get("client")
+
+        access_logger.info(
+            "request",
+            extra={
+                "fields": {
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status_code,
+                    "duration_ms": round(duration_ns / 1_000_000, 3),
+                    "client": client[0] if client else None,
+                }
+            },
+        )
+
 
 def register_middleware(app: FastAPI):
 
-    @app.middleware("http")
-    async def custom_logging(request: Request, call_next):
-        start_time = time.time()
-        response = await call_next(request)
-        processing_time = time.time() - start_time
+    if Config.ACCESS_LOG:
+        app.add_middleware(AccessLogMiddleware, sample_rate=Config.ACCESS_LOG_SAMPLE_RATE)
 
-        message = f"{request.client.host} - {request.client.port} - {request.method} - {request.url.path} - completed after {processing_time}s"
+    if Config.METRICS:
+        app.add_middleware(MetricsMiddleware)
 
-        print(message)
-        return response
+    if Config.SQL_INSTRUMENTATION:
+        app.add_middleware(
+            QueryStatsMiddleware, n_plus_one_threshold=Config.SQL_N_PLUS_ONE_THRESHOLD
+        )
 
     app.add_middleware(
         CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_credentials=True
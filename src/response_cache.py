@@ -0,0 +1,194 @@
+"""Serialised JSON responses for read-mostly endpoints.
+
+Entries are keyed by route, parameters and a generation token for each
+namespace the response depends on, e.g. "books" for the lists or
+"book:<uid>" for one book. Invalidating a namespace drops its token, so
+every entry built on it becomes unreachable without having to find them.
+The in-process backend is per worker, so other workers can serve a stale
+entry for up to RESPONSE_CACHE_TTL seconds; the Redis backend is shared.
+
+A generation remembers when it started. For its first replica_lag seconds
+(READ_YOUR_WRITES_SECONDS) a response read from a replica is served but not
+stored, since the replica may not have the write that ended the previous
+generation yet; the same bound is what pins a writer to the primary.
+"""
+from collections import Counter
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Iterable
+from urllib.parse import urlencode
+import time
+import uuid
+
+from fastapi import Request, Response
+
+from src.cache import TTLCache
+from src.conditional import body_etag, is_not_modified, not_modified, validator_headers
+from src.config import Config
+from src.db.redis import token_blocklist
+from src.serialization import dump_json
+
+BOOKS = "books"
+TAGS = "tags"
+
+
+def book_namespace(book_uid) -> str:
+    return f"book:{book_uid}"
+
+
+def new_generation() -> str:
+    return f"{time.time()}-{uuid.uuid4().hex}"
+
+
+def generation_age(token: str) -> float:
+    started, _, _ = token.partition("-")
+
+    try:
+        return time.time() - float(started)
+    except ValueError:
+        return 0.0
+
+
+class MemoryBackend:
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get_many(self, keys: list[str]) -> list[Any]:
+        return [self.entries.get(key) for key in keys]
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        self.entries.set(key, value, ttl)
+
+    async def add(self, key: str, value: Any, ttl: int) -> bool:
+        if self.entries.get(key) is not None:
+            return False
+
+        self.entries.set(key, value, ttl)
+        return True
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.entries.delete(key)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+class RedisBackend:
+    def __init__(self, client, prefix: str = "response:") -> None:
+        self.client = client
+        self.prefix = prefix
+
+    async def get_many(self, keys: list[str]) -> list[Any]:
+        return await self.client.mget([self.prefix + key for key in keys])
+
+    async def set(self, key: str, value: Any, ttl: int) -> None:
+        await self.client.set(self.prefix + key, value, ex=ttl)
+
+    async def add(self, key: str, value: Any, ttl: int) -> bool:
+        return bool(await self.client.set(self.prefix + key, value, ex=ttl, nx=True))
+
+    async def delete(self, *keys: str) -> None:
+        await self.client.delete(*[self.prefix + key for key in keys])
+
+
+class ResponseCache:
+    def __init__(
+        self, backend, ttl: int, enabled: bool = True, replica_lag: float = 0
+    ) -> None:
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+        self.replica_lag = replica_lag
+        self.hits: Counter[str] = Counter()
+        self.misses: Counter[str] = Counter()
+
+    async def generations(self, namespaces: Iterable[str]) -> list[str]:
+        keys = [f"gen:{namespace}" for namespace in namespaces]
+        tokens = await self.backend.get_many(keys)
+
+        for i, token in enumerate(tokens):
+            if token is None:
+                token = new_generation()
+
+                # another request may have started this generation first
+                if not await self.backend.add(keys[i], token, self.ttl):
+                    token = (await self.backend.get_many([keys[i]]))[0] or token
+
+                tokens[i] = token
+
+        return [token.decode() if isinstance(token, bytes) else token for token in tokens]
+
+    async def respond(
+        self,
+        request: Request,
+        namespaces: Iterable[str],
+        model,
+        produce: Callable[[], Awaitable[Any]],
+        etag: str | None = None,
+        last_modified: datetime | None = None,
+        replica: bool = False,
+    ) -> Response:
+        """Return the cached body for this request, or await `produce` and
+        cache its result serialised through `model`.
+
+        Without an `etag` from the caller the body's hash is used, and a
+        matching If-None-Match gets a 304. A caller's etag is part of the key,
+        so a fresh validator is never paired with a stale body. Pass
+        `replica` when `produce` reads from a replica.
+        """
+        body = None
+        key = None
+        store = True
+
+        if self.enabled:
+            route = request.scope["route"].path
+            query = urlencode(sorted(request.query_params.multi_items()))
+            tokens = await self.generations(namespaces)
+            key = ":".join([*tokens, etag or "", request.url.path, query])
+
+            if replica:
+                store = all(generation_age(token) >= self.replica_lag for token in tokens)
+
+            body = (await self.backend.get_many([key]))[0]
+
+            if body is not None:
+                self.hits[route] += 1
+            else:
+                self.misses[route] += 1
+
+        if body is None:
+            body = dump_json(model, await produce())
+
+            if key is not None and store:
+                await self.backend.set(key, body, self.ttl)
+
+        if etag is None:
+            etag = body_etag(body)
+
+            if is_not_modified(request, etag):
+                return not_modified(validator_headers(etag))
+
+        return Response(
+            content=body,
+            media_type="application/json",
+            headers=validator_headers(etag, last_modified),
+        )
+
+    async def invalidate(self, *namespaces: str) -> None:
+        if self.enabled:
+            await self.backend.delete(*[f"gen:{namespace}" for namespace in namespaces])
+
+    def stats(self) -> dict:
+        return {"hits": dict(self.hits), "misses": dict(self.misses)}
+
+
+response_cache = ResponseCache(
+    backend=(
+        RedisBackend(token_blocklist)
+        if Config.RESPONSE_CACHE_REDIS
+        else MemoryBackend(maxsize=Config.RESPONSE_CACHE_SIZE, ttl=Config.RESPONSE_CACHE_TTL)
+    ),
+    ttl=Config.RESPONSE_CACHE_TTL,
+    enabled=Config.RESPONSE_CACHE,
+    replica_lag=Config.READ_YOUR_WRITES_SECONDS,
+)
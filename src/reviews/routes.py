@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from src.db.models import User
-from src.reviews.schemas import ReviewCreateModel
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from src.auth.schemas import UserPrincipal
+from src.reviews.schemas import ReviewCreateModel, ReviewModel
+from src.export import ExportFormat, MEDIA_TYPES, encode_rows
+from fastapi.responses import StreamingResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.db.main import get_session
+from src.db.main import get_read_session, get_session
 from src.reviews.service import ReviewService
-from src.auth.dependencies import get_curr_user
+from src.auth.dependencies import get_curr_principal
 from src.auth.dependencies import RoleChecker
+from src.conditional import weak_etag, is_not_modified, not_modified, validator_headers
+from src.serialization import json_response
 
 admin_role_checker = RoleChecker(["admin"])
 user_role_checker = RoleChecker(["user", "admin"])
@@ -18,12 +22,12 @@ review_service = ReviewService()
 async def add_review_to_book(
     book_uid: str,
     review_data: ReviewCreateModel,
-    current_user: User = Depends(get_curr_user),
+    current_user: UserPrincipal = Depends(get_curr_principal),
     session: AsyncSession = Depends(get_session),
     check_role=Depends(user_role_checker),
 ):
     new_review = await review_service.add_review_to_book(
-        user_email=current_user.email,
+        user_uid=current_user.uid,
         review_data=review_data,
         book_uid=book_uid,
         session=session,
@@ -34,7 +38,7 @@ async def add_review_to_book(
 
 @review_router.get("/")
 async def get_all_reviews(
-    session: AsyncSession = Depends(get_session), check_role=Depends(admin_role_checker)
+    session: AsyncSession = Depends(get_read_session), check_role=Depends(admin_role_checker)
 ):
     reviews = await review_service.get_all_reviews(session)
 
@@ -46,12 +50,29 @@ async def get_all_reviews(
     )
 
 
-@review_router.get("/{review_id}")
-async def get_review(review_id: str, session: AsyncSession = Depends(get_session), check_role = Depends(user_role_checker)):
+@review_router.get("/export")
+async def export_reviews(
+    format: ExportFormat = ExportFormat.ndjson,
+    session: AsyncSession = Depends(get_read_session),
+    check_role=Depends(admin_role_checker),
+):
+    rows = encode_rows(review_service.stream_reviews(session), ReviewModel, format)
+
+    return StreamingResponse(rows, media_type=MEDIA_TYPES[format])
+
+
+@review_router.get("/{review_id}", response_model=ReviewModel)
+async def get_review(request: Request, review_id: str, session: AsyncSession = Depends(get_read_session), check_role = Depends(user_role_checker)):
     result = await review_service.get_review(review_id, session)
 
     if result:
-        return result
+        etag = weak_etag(result.uid, result.updated_at.isoformat())
+        headers = validator_headers(etag, result.updated_at)
+
+        if is_not_modified(request, etag, result.updated_at):
+            return not_modified(headers)
+
+        return json_response(ReviewModel, result, headers=headers)
 
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND, detail="Review not found"
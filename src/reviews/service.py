@@ -1,8 +1,9 @@
 from src.db.models import Review
-from src.auth.service import UserService
 from src.books.service import BookService
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.reviews.schemas import ReviewCreateModel
+from src.reviews.schemas import ReviewCreateModel, ReviewModel
+from src.export import EXPORT_BATCH_SIZE
+from src.response_cache import response_cache, book_namespace, BOOKS
 from fastapi import HTTPException, status
 from sqlmodel import select
 from src.db.models import Review
@@ -10,21 +11,37 @@ from fastapi import Depends
 from src.db.main import get_session
 from sqlmodel import desc
 
-user_service = UserService()
 book_service = BookService()
 
+REVIEW_EXPORT_COLUMNS = [getattr(Review, field) for field in ReviewModel.model_fields]
+
 
 class ReviewService:
+    def update_rating_aggregates(self, book, rating: int, delta: int):
+        """Add (delta=1) or remove (delta=-1) one rating from a locked book row"""
+        book.review_count += delta
+        book.rating_sum += delta * rating
+        book.rating_avg = book.rating_sum / book.review_count if book.review_count else 0
+
+        histogram = dict(book.rating_histogram)
+        key = str(rating)
+        histogram[key] = histogram.get(key, 0) + delta
+
+        if histogram[key] <= 0:
+            del histogram[key]
+
+        # a new dict so the JSON column is seen as changed
+        book.rating_histogram = histogram
+
     async def add_review_to_book(
         self,
-        user_email: str,
+        user_uid: str,
         book_uid: str,
         review_data: ReviewCreateModel,
         session: AsyncSession,
     ):
         try:
-            book = await book_service.get_book(book_uid, session)
-            user = await user_service.get_user_by_email(user_email, session)
+            book = await book_service.get_book(book_uid, session, for_update=True)
 
             review_data_dict = review_data.model_dump()
 
@@ -35,16 +52,13 @@ class ReviewService:
                     status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
                 )
 
-            if not user:
-                raise HTTPException(
-                    status_code=status.HTTP_404_NOT_FOUND, detail="User not found"
-                )
-
-            new_review.user = user
+            new_review.user_uid = user_uid
             new_review.book = book
+            self.update_rating_aggregates(book, new_review.rating, 1)
 
             session.add(new_review)
             await session.commit()
+            await response_cache.invalidate(BOOKS, book_namespace(book.uid))
 
             return new_review
 
@@ -61,6 +75,19 @@ class ReviewService:
         reviews = result.all()
 
         return reviews
+
+    async def stream_reviews(self, session: AsyncSession):
+        """Yield every review in batches from a server-side cursor"""
+        statement = (
+            select(*REVIEW_EXPORT_COLUMNS)
+            .order_by(Review.created_at, Review.uid)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+
+        result = await session.stream(statement)
+
+        async for partition in result.partitions():
+            yield partition
     
 
     async def get_review(self, review_uid: str, session: AsyncSession = Depends(get_session)):
@@ -74,9 +101,18 @@ class ReviewService:
         review = await self.get_review(review_uid, session)
 
         if review:
+            book_uid = review.book_uid
+
+            if book_uid is not None:
+                book = await book_service.get_book(book_uid, session, for_update=True)
+                self.update_rating_aggregates(book, review.rating, -1)
+
             await session.delete(review)
             await session.commit()
 
+            if book_uid is not None:
+                await response_cache.invalidate(BOOKS, book_namespace(book_uid))
+
             return "Review deletion success"
         
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Review not found")
\ No newline at end of file
@@ -0,0 +1,53 @@
+"""JSON bodies serialised by pydantic-core in one pass.
+
+For a route with a response_model, FastAPI validates the returned value,
+turns it into plain Python with jsonable_encoder and then encodes that
+again with json.dumps. Returning json_response() from a route skips all
+of that: the value is validated once by a cached TypeAdapter and dumped
+straight to bytes. Query rows are turned into dicts first. Validating a
+Row with from_attributes goes through Row.__getattr__ for every field
+and costs about three times as much.
+"""
+from functools import lru_cache
+from typing import Any
+
+from fastapi import Response
+from pydantic import TypeAdapter
+from sqlalchemy.engine import Row
+
+
+@lru_cache
+def type_adapter(model) -> TypeAdapter:
+    return TypeAdapter(model)
+
+
+def plain(value: Any) -> Any:
+    """`value` with any SQLAlchemy Rows in it, at any depth of lists and
+    dicts, replaced by dicts. ORM objects are left as they are."""
+    if isinstance(value, Row):
+        return dict(zip(value._fields, value))
+
+    if isinstance(value, list):
+        return [plain(item) for item in value]
+
+    if isinstance(value, dict):
+        return {key: plain(item) for key, item in value.items()}
+
+    return value
+
+
+def dump_json(model, value: Any) -> bytes:
+    adapter = type_adapter(model)
+
+    return adapter.dump_json(adapter.validate_python(plain(value), from_attributes=True))
+
+
+def json_response(
+    model, value: Any, status_code: int = 200, headers: dict | None = None
+) -> Response:
+    return Response(
+        content=dump_json(model, value),
+        status_code=status_code,
+        media_type="application/json",
+        headers=headers,
+    )
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from src.tags.service import TagService
 from src.auth.dependencies import RoleChecker
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.db.main import get_session
+from src.db.main import get_read_session, get_session
+from src.db.replicas import on_replica
 from typing import List
 from src.tags.schemas import TagModel, TagAddModel, TagCreateModel
 from src.books.models import Book
+from src.response_cache import response_cache, TAGS
+from src.serialization import json_response
 
 user_role_checker = RoleChecker(["user", "admin"])
 tag_router = APIRouter()
@@ -13,10 +16,14 @@ tag_service = TagService()
 
 
 @tag_router.get("/", response_model=List[TagModel])
-async def get_all_tags(session: AsyncSession = Depends(get_session), role_check = Depends(user_role_checker)):
-    tags = await tag_service.get_all_tags(session)
-
-    return tags
+async def get_all_tags(request: Request, session: AsyncSession = Depends(get_read_session), role_check = Depends(user_role_checker)):
+    return await response_cache.respond(
+        request,
+        [TAGS],
+        List[TagModel],
+        lambda: tag_service.get_all_tags(session),
+        replica=on_replica(session),
+    )
 
 @tag_router.post("/")
 async def add_tag(tag_data: TagCreateModel, session: AsyncSession = Depends(get_session), role_check = Depends(user_role_checker)):
@@ -28,13 +35,13 @@ async def add_tag(tag_data: TagCreateModel, session: AsyncSession = Depends(get_
 async def add_tag_to_book(book_uid: str, tag_data: TagAddModel, session: AsyncSession = Depends(get_session), role_check = Depends(user_role_checker)):
     book_with_tag = await tag_service.add_tag_to_book(book_uid, tag_data, session)
 
-    return book_with_tag
+    return json_response(Book, book_with_tag)
 
 @tag_router.put("/{tag_uid}", response_model=TagModel)
 async def update_tag(tag_uid: str, tag_update_data: TagCreateModel, session: AsyncSession = Depends(get_session), role_check = Depends(user_role_checker)):
     updated_tag = await tag_service.update_tag(tag_uid, tag_update_data, session)
 
-    return updated_tag
+    return json_response(TagModel, updated_tag)
 
 @tag_router.delete("/{tag_uid}")
 async def delete_tag(tag_uid: str, session: AsyncSession = Depends(get_session), role_check = Depends(user_role_checker)):
@@ -1,10 +1,14 @@
 from src.db.main import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
 from fastapi import Depends, HTTPException, status
-from src.db.models import Tag
+from src.db.models import BookTag, Tag
 from sqlmodel import select, desc
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime
+import uuid
 from src.tags.schemas import TagAddModel, TagCreateModel
 from src.books.service import BookService
+from src.response_cache import response_cache, book_namespace, TAGS
 
 book_service = BookService()
 
@@ -37,23 +41,52 @@ class TagService:
                 status_code=status.HTTP_404_NOT_FOUND, detail="Book not found"
             )
 
-        for tag_item in tag_data.tags:
-            statement = select(Tag).where(tag_item.name == Tag.name)
-            result = await session.exec(statement)
+        names = list(dict.fromkeys(tag_item.name for tag_item in tag_data.tags))
 
-            tag = result.one_or_none()
+        if names:
+            tag_ids = await self.resolve_tag_ids(names, session)
 
-            if not tag:
-                tag = Tag(name=tag_item.name)
-
-            book.tags.append(tag)
+            link_statement = (
+                insert(BookTag)
+                .values([{"book_uid": book.uid, "tag_id": tag_id} for tag_id in tag_ids])
+                .on_conflict_do_nothing()
+            )
+            await session.exec(link_statement)
 
-        session.add(book)
         await session.commit()
-        await session.refresh(book)
+        await response_cache.invalidate(TAGS, book_namespace(book.uid))
 
         return book
 
+    async def resolve_tag_ids(self, names: list[str], session: AsyncSession):
+        """Return the uids of the named tags, creating any that are missing"""
+        statement = select(Tag.name, Tag.uid).where(Tag.name.in_(names))
+        result = await session.exec(statement)
+        tag_ids = dict(result.all())
+
+        missing = [name for name in names if name not in tag_ids]
+
+        if missing:
+            now = datetime.now()
+            create_statement = (
+                insert(Tag)
+                .values([{"uid": uuid.uuid4(), "name": name, "created_at": now} for name in missing])
+                .on_conflict_do_nothing(index_elements=["name"])
+                .returning(Tag.name, Tag.uid)
+            )
+            result = await session.exec(create_statement)
+            tag_ids.update(result.all())
+
+            # tags created concurrently by another request are not returned
+            raced = [name for name in missing if name not in tag_ids]
+            if raced:
+                result = await session.exec(
+                    select(Tag.name, Tag.uid).where(Tag.name.in_(raced))
+                )
+                tag_ids.update(result.all())
+
+        return [tag_ids[name] for name in names]
+
     async def add_tag(
         self, tag_data: TagCreateModel, session: AsyncSession = Depends(get_session)
     ):
@@ -71,6 +104,7 @@ class TagService:
 
         session.add(new_tag)
         await session.commit()
+        await response_cache.invalidate(TAGS)
 
         return new_tag
 
@@ -93,6 +127,7 @@ class TagService:
             setattr(tag, k, v)
 
         await session.commit()
+        await response_cache.invalidate(TAGS)
         await session.refresh(tag)
 
         return tag
@@ -109,3 +144,4 @@ class TagService:
 
         await session.delete(tag)
         await session.commit()
+        await response_cache.invalidate(TAGS)
@@ -2,7 +2,16 @@ from src.db.main import get_session
 from src import app
 from fastapi.testclient import TestClient
 from unittest.mock import AsyncMock
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy import event
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.db.instrumentation import QueryStats
+from src.config import Config
 import pytest
+import os
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
 
 mock_session = AsyncMock()
 mock_user_service = AsyncMock()
@@ -23,4 +32,93 @@ def fake_user_service():
 
 @pytest.fixture
 def test_client():
-    return TestClient(app)
\ No newline at end of file
+    return TestClient(app)
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "allow_repeated_queries: the test repeats a query on purpose"
+    )
+
+
+def guard_n_plus_one(request, engine):
+    """Fail the test if one SELECT shape is sent through `engine` often
+    enough to look like an N+1"""
+    stats = QueryStats()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        stats.record(statement, 0)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+    if request.node.get_closest_marker("allow_repeated_queries") is None:
+        repeated = stats.n_plus_one(Config.SQL_N_PLUS_ONE_THRESHOLD)
+        assert not repeated, f"Possible N+1 queries: {repeated}"
+
+@pytest.fixture
+async def db_engine(request):
+    pytest.importorskip("aiosqlite")
+    engine = create_async_engine("sqlite+aiosqlite://")
+
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.create_all)
+
+    for _ in guard_n_plus_one(request, engine):
+        yield engine
+
+    await engine.dispose()
+
+@pytest.fixture
+async def db_session(db_engine):
+    async with AsyncSession(db_engine, expire_on_commit=False) as session:
+        yield session
+
+@pytest.fixture
+async def pg_engine(request):
+    """A Postgres database for tests that need its dialect or planner"""
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    engine = create_async_engine(TEST_DATABASE_URL)
+
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.drop_all)
+        await connection.run_sync(SQLModel.metadata.create_all)
+
+    for _ in guard_n_plus_one(request, engine):
+        yield engine
+
+    async with engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.drop_all)
+
+    await engine.dispose()
+
+@pytest.fixture
+async def pg_session(pg_engine):
+    async with AsyncSession(pg_engine, expire_on_commit=False) as session:
+        yield session
+
+
+def record_statements(engine):
+    """Collect the SQL statements sent through `engine` until the generator closes"""
+    recorded = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        recorded.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield recorded
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+@pytest.fixture
+def statements(db_engine):
+    yield from record_statements(db_engine)
+
+@pytest.fixture
+def pg_statements(pg_engine):
+    yield from record_statements(pg_engine)
@@ -1,3 +1,13 @@
+from src.auth.service import UserService
+from src.auth.utils import create_access_token, decode_token
+from src.auth.utils import PasswordHasher, generate_pwd_hash, verify_pwd
+from fastapi import HTTPException
+from src.cache import TTLCache
+from unittest.mock import patch
+import jwt
+import pytest
+
+user_service = UserService()
 
 auth_prefix = f"/api/v1/auth"
 
@@ -15,4 +25,94 @@ def test_user_creation(fake_session, fake_user_service, test_client):
         json=signup_data,
     )
 
-    assert fake_user_service.user_exists_called_once()
\ No newline at end of file
+    assert fake_user_service.user_exists_called_once()
+
+async def seed_user(session, email: str):
+    from src.db.models import User
+
+    user = User(
+        username="cached",
+        email=email,
+        first_name="Cached",
+        last_name="User",
+        password_hash="x",
+        role="user",
+    )
+    session.add(user)
+    await session.commit()
+
+    return user
+
+
+@pytest.mark.anyio
+async def test_user_principal_is_cached(db_session, statements):
+    user = await seed_user(db_session, "principal@bookly.dev")
+    statements.clear()
+
+    first = await user_service.get_user_principal(user.email, db_session)
+    second = await user_service.get_user_principal(user.email, db_session)
+
+    assert first == second
+    assert first.role == "user" and not first.is_verified
+    assert len(statements) == 1
+
+
+@pytest.mark.anyio
+async def test_update_user_invalidates_principal(db_session):
+    user = await seed_user(db_session, "invalidate@bookly.dev")
+    await user_service.get_user_principal(user.email, db_session)
+
+    await user_service.update_user(user, {"is_verified": True}, db_session)
+    principal = await user_service.get_user_principal(user.email, db_session)
+
+    assert principal.is_verified
+
+
+def test_ttl_cache_expires_and_evicts():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 3)
+    cache.set("d", 4, ttl=0)
+
+    assert cache.get("a") is None
+    assert cache.get("c") == 3
+    assert cache.get("d") is None
+
+
+def test_token_is_verified_once():
+    token = create_access_token(user_data={"email": "jwt@bookly.dev"})
+
+    with patch("src.auth.utils.jwt.decode", wraps=jwt.decode) as jwt_decode:
+        first = decode_token(token)
+        second = decode_token(token)
+
+    assert first == second
+    assert first["user"]["email"] == "jwt@bookly.dev"
+    assert jwt_decode.call_count == 1
+
+
+def test_invalid_token_is_rejected_without_caching():
+    token = create_access_token(user_data={"email": "jwt@bookly.dev"}) + "tampered"
+
+    assert decode_token(token) is None
+    assert decode_token(token) is None
+
+
+@pytest.mark.anyio
+async def test_password_hashing_runs_on_pool():
+    pwd_hash = await generate_pwd_hash("secret12")
+
+    assert await verify_pwd("secret12", pwd_hash)
+    assert not await verify_pwd("wrong123", pwd_hash)
+
+
+@pytest.mark.anyio
+async def test_saturated_hasher_returns_503():
+    hasher = PasswordHasher(workers=1, max_pending=0)
+    hasher.pending = 1
+
+    with pytest.raises(HTTPException) as exc:
+        await hasher.run(sum, [1, 2])
+
+    assert exc.value.status_code == 503
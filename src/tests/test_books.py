@@ -0,0 +1,369 @@
+from src import app
+from src.books.routes import access_token_bearer, role_checker
+from src.books.service import BookService
+from src.books.utils import encode_cursor, decode_cursor
+from src.books.importer import aiter_sync, iter_lines, iter_records
+from src.books.models import Book as BookModel
+from src.export import ExportFormat, encode_rows
+from sqlmodel import delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+from src.db.models import Book, Review, Tag, User
+from datetime import datetime, date, timedelta
+from src.db.main import get_read_session
+from src.errors import InvalidCursor
+from httpx import ASGITransport, AsyncClient
+import uuid
+import json
+import tracemalloc
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+book_service = BookService()
+
+
+async def seed_books(session, count: int, user_uid=None):
+    start = datetime(2024, 1, 1)
+
+    for i in range(count):
+        session.add(
+            Book(
+                title=f"Book {i}",
+                author="Author",
+                publisher="Publisher",
+                published_date=date(2000, 1, 1),
+                page_count=100,
+                language="English",
+                user_uid=user_uid,
+                created_at=start + timedelta(minutes=i),
+                updated_at=start + timedelta(minutes=i),
+            )
+        )
+
+    await session.commit()
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 17, 12, 30, 45, 123456)
+    uid = uuid.uuid4()
+
+    assert decode_cursor(encode_cursor(created_at, uid)) == (created_at, uid)
+
+
+def test_invalid_cursor_is_rejected():
+    assert decode_cursor("not-a-cursor") is None
+
+
+async def test_get_all_books_walks_every_page(db_session):
+    await seed_books(db_session, 5)
+
+    titles = []
+    cursor = None
+
+    while True:
+        page = await book_service.get_all_books(db_session, cursor, limit=2)
+        titles.extend(book.title for book in page["books"])
+        cursor = page["next_cursor"]
+
+        if cursor is None:
+            break
+
+    assert titles == [f"Book {i}" for i in reversed(range(5))]
+
+
+async def test_get_user_books_is_paginated(db_session):
+    user_uid = uuid.uuid4()
+    await seed_books(db_session, 3, user_uid=user_uid)
+
+    page = await book_service.get_user_books(user_uid, db_session, limit=3)
+
+    assert len(page["books"]) == 3
+    assert page["next_cursor"] is None
+
+
+async def test_bad_cursor_returns_400(db_session, monkeypatch):
+    with pytest.raises(InvalidCursor):
+        await book_service.get_all_books(db_session, "garbage", limit=2)
+
+    async def use_db_session():
+        yield db_session
+
+    monkeypatch.setitem(app.dependency_overrides, get_read_session, use_db_session)
+    monkeypatch.setitem(app.dependency_overrides, access_token_bearer, lambda: {})
+    monkeypatch.setitem(app.dependency_overrides, role_checker, lambda: True)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/api/v1/books", params={"cursor": "garbage"})
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
+
+
+async def seed_book_graph(session):
+    user = User(
+        username="reader",
+        email="reader@bookly.dev",
+        first_name="Book",
+        last_name="Reader",
+        password_hash="x",
+        role="user",
+    )
+    book = Book(
+        title="Graph",
+        author="Author",
+        publisher="Publisher",
+        published_date=date(2000, 1, 1),
+        page_count=100,
+        language="English",
+        user=user,
+    )
+    book.reviews = [Review(rating=4, review_text="Good", user=user) for _ in range(3)]
+    book.tags = [Tag(name="fiction"), Tag(name="classic")]
+    session.add(book)
+    await session.commit()
+    session.expunge_all()
+
+    return book.uid, user.uid
+
+
+async def test_get_all_books_emits_one_statement(db_session, statements):
+    await seed_book_graph(db_session)
+    statements.clear()
+
+    page = await book_service.get_all_books(db_session)
+
+    assert len(page["books"]) == 1
+    assert len(statements) == 1
+
+
+async def test_get_user_books_emits_one_statement(db_session, statements):
+    _, user_uid = await seed_book_graph(db_session)
+    statements.clear()
+
+    page = await book_service.get_user_books(user_uid, db_session)
+
+    assert len(page["books"]) == 1
+    assert len(statements) == 1
+
+
+async def test_get_book_detail_only_loads_reviews(db_session, statements):
+    book_uid, _ = await seed_book_graph(db_session)
+    statements.clear()
+
+    book = await book_service.get_book(book_uid, db_session, Book.reviews)
+
+    assert len(book.reviews) == 3
+    assert len(statements) == 2
+
+
+async def test_get_book_without_relationships_emits_one_statement(db_session, statements):
+    book_uid, _ = await seed_book_graph(db_session)
+    statements.clear()
+
+    await book_service.get_book(book_uid, db_session)
+
+    assert len(statements) == 1
+
+
+def catalogue_row(i: int) -> dict:
+    return {
+        "title": f"Imported {i}",
+        "author": "Author",
+        "publisher": "Publisher",
+        "published_date": "2001-02-03",
+        "page_count": 100 + i,
+        "language": "English",
+    }
+
+
+async def test_import_jsonl_reports_bad_rows(db_session):
+    lines = [json.dumps(catalogue_row(i)) for i in range(5)]
+    lines.insert(2, json.dumps({**catalogue_row(99), "page_count": "many"}))
+    lines.insert(4, "{not json")
+    body = ("\n".join(lines) + "\n").encode()
+    # split the body at awkward places to exercise line reassembly
+    chunks = aiter_sync(body[i : i + 7] for i in range(0, len(body), 7))
+
+    report = await book_service.import_books(
+        iter_records(iter_lines(chunks), "jsonl"), None, db_session, chunk_size=2
+    )
+
+    assert report["imported"] == 5
+    assert report["failed"] == 2
+    assert [error["row"] for error in report["errors"]] == [3, 5]
+
+    page = await book_service.get_all_books(db_session, limit=10)
+    assert len(page["books"]) == 5
+
+
+async def test_import_csv(db_session):
+    header = list(catalogue_row(0))
+    lines = [",".join(header)] + [
+        ",".join(str(v) for v in catalogue_row(i).values()) for i in range(3)
+    ]
+
+    report = await book_service.import_books(
+        iter_records(aiter_sync(lines), "csv"), uuid.uuid4(), db_session
+    )
+
+    assert report == {"imported": 3, "failed": 0, "errors": []}
+
+
+async def test_csv_quoted_fields_may_span_lines():
+    body = b'title,author\n"Dune","Frank\nHerbert"\n"Emma","Jane\n\nAusten"\n'
+    chunks = aiter_sync(body[i : i + 5] for i in range(0, len(body), 5))
+
+    records = [record async for record in iter_records(iter_lines(chunks), "csv")]
+
+    assert records == [
+        {"title": "Dune", "author": "Frank\nHerbert"},
+        {"title": "Emma", "author": "Jane\n\nAusten"},
+    ]
+
+
+async def test_import_rejects_over_long_lines(db_session):
+    lines = [json.dumps(catalogue_row(i)) for i in range(3)]
+    lines.insert(1, json.dumps({**catalogue_row(99), "title": "x" * 500}))
+    body = ("\n".join(lines) + "\n").encode()
+    chunks = aiter_sync(body[i : i + 64] for i in range(0, len(body), 64))
+
+    report = await book_service.import_books(
+        iter_records(iter_lines(chunks, max_length=300), "jsonl"), None, db_session
+    )
+
+    assert report["imported"] == 3
+    assert report["errors"] == [{"row": 2, "errors": "Record longer than 300 characters"}]
+
+
+async def test_import_rejects_lines_that_are_not_utf8(db_session):
+    lines = [json.dumps(catalogue_row(i)).encode() for i in range(3)]
+    lines.insert(2, json.dumps(catalogue_row(99)).encode().replace(b"Imported", b"Imp\xff"))
+    chunks = aiter_sync([b"\n".join(lines)])
+
+    report = await book_service.import_books(
+        iter_records(iter_lines(chunks), "jsonl"), None, db_session
+    )
+
+    assert report["imported"] == 3
+    assert report["errors"] == [{"row": 3, "errors": "Record is not valid UTF-8"}]
+
+
+async def test_import_reports_only_the_rows_the_database_rejects(pg_session):
+    rows = [catalogue_row(i) for i in range(4)]
+    # valid for the model but out of range for the integer column
+    rows[2]["page_count"] = 2**40
+
+    report = await book_service.import_books(
+        aiter_sync(rows), None, pg_session, chunk_size=4
+    )
+
+    assert report["imported"] == 3
+    assert report["failed"] == 1
+    assert [error["row"] for error in report["errors"]] == [3]
+
+    page = await book_service.get_all_books(pg_session, limit=10)
+    assert len(page["books"]) == 3
+
+
+async def export_text(session, fmt) -> str:
+    chunks = encode_rows(book_service.stream_books(session), BookModel, fmt)
+
+    return "".join([chunk async for chunk in chunks])
+
+
+async def test_export_ndjson_and_csv(db_session):
+    await seed_books(db_session, 3)
+
+    ndjson = await export_text(db_session, ExportFormat.ndjson)
+    rows = [json.loads(line) for line in ndjson.splitlines()]
+    assert [row["title"] for row in rows] == ["Book 2", "Book 1", "Book 0"]
+
+    csv_lines = (await export_text(db_session, ExportFormat.csv)).splitlines()
+    assert csv_lines[0].split(",") == list(BookModel.model_fields)
+    assert len(csv_lines) == 4
+
+
+async def export_peak_memory(session, rows: int) -> int:
+    records = aiter_sync(catalogue_row(i) for i in range(rows))
+    await book_service.import_books(records, None, session)
+    session.expunge_all()
+
+    tracemalloc.start()
+    try:
+        async for _ in encode_rows(
+            book_service.stream_books(session), BookModel, ExportFormat.ndjson
+        ):
+            pass
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+async def test_export_memory_is_flat(db_engine, monkeypatch):
+    monkeypatch.setattr("src.books.service.EXPORT_BATCH_SIZE", 50)
+
+    async with AsyncSession(db_engine) as session:
+        small = await export_peak_memory(session, 500)
+
+    async with AsyncSession(db_engine) as session:
+        await session.exec(delete(Book))
+        await session.commit()
+        large = await export_peak_memory(session, 5000)
+
+    # ten times the rows must not cost ten times the memory
+    assert large < small * 2
+
+
+async def seed_search_books(session):
+    for title, author, publisher in [
+        ("The Hobbit", "J. R. R. Tolkien", "Allen & Unwin"),
+        ("The Lord of the Rings", "J. R. R. Tolkien", "Allen & Unwin"),
+        ("Dune", "Frank Herbert", "Chilton Books"),
+        ("Dune Messiah", "Frank Herbert", "G. P. Putnam's Sons"),
+        ("Neuromancer", "William Gibson", "Ace"),
+    ]:
+        session.add(
+            Book(
+                title=title,
+                author=author,
+                publisher=publisher,
+                published_date=date(2000, 1, 1),
+                page_count=100,
+                language="English",
+            )
+        )
+
+    await session.commit()
+
+
+async def test_search_ranks_full_text_matches(pg_session):
+    await seed_search_books(pg_session)
+
+    page = await book_service.search_books("dune", pg_session)
+    titles = [book.title for book in page["books"]]
+
+    assert titles[0] == "Dune"
+    assert set(titles) == {"Dune", "Dune Messiah"}
+
+
+async def test_search_matches_typos_and_prefixes(pg_session):
+    await seed_search_books(pg_session)
+
+    typo = await book_service.search_books("tolkin", pg_session)
+    prefix = await book_service.search_books("neuroman", pg_session)
+
+    assert {book.title for book in typo["books"]} == {"The Hobbit", "The Lord of the Rings"}
+    assert [book.title for book in prefix["books"]] == ["Neuromancer"]
+
+
+async def test_search_walks_every_page(pg_session):
+    await seed_search_books(pg_session)
+
+    first = await book_service.search_books("tolkien", pg_session, limit=1)
+    second = await book_service.search_books("tolkien", pg_session, first["next_cursor"], limit=1)
+
+    assert second["next_cursor"] is None
+    assert {first["books"][0].title, second["books"][0].title} == {
+        "The Hobbit",
+        "The Lord of the Rings",
+    }
@@ -0,0 +1,123 @@
+from src import app
+from src.books.routes import access_token_bearer, role_checker
+from src.books.service import BookService
+from src.books.models import BookUpdateModel
+from src.conditional import is_not_modified, weak_etag
+from src.db.main import get_read_session, get_session
+from src.db.models import Book, Review
+from starlette.requests import Request
+from httpx import ASGITransport, AsyncClient
+from datetime import date, datetime, timedelta
+import uuid
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+book_service = BookService()
+
+
+def request_with(**headers) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()],
+        }
+    )
+
+
+def test_if_none_match_compares_weakly():
+    etag = weak_etag("a", 1)
+
+    assert is_not_modified(request_with(if_none_match=etag), etag)
+    assert is_not_modified(request_with(if_none_match=f'"x", {etag.removeprefix("W/")}'), etag)
+    assert is_not_modified(request_with(if_none_match="*"), etag)
+    assert not is_not_modified(request_with(if_none_match=weak_etag("b")), etag)
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    request = request_with(
+        if_none_match=weak_etag("old"),
+        if_modified_since="Fri, 01 Jan 2100 00:00:00 GMT",
+    )
+
+    assert not is_not_modified(request, weak_etag("new"), datetime(2024, 1, 1))
+
+
+def test_if_modified_since():
+    last_modified = datetime(2024, 1, 1, 12, 0, 0, 500000).astimezone()
+    header = last_modified.strftime("%a, %d %b %Y %H:%M:%S %z")
+
+    assert is_not_modified(request_with(if_modified_since=header), "x", last_modified)
+    assert not is_not_modified(
+        request_with(if_modified_since=header), "x", last_modified + timedelta(seconds=1)
+    )
+    assert not is_not_modified(request_with(if_modified_since="garbage"), "x", last_modified)
+
+
+async def seed_book(session) -> Book:
+    book = Book(
+        title="Polled",
+        author="Author",
+        publisher="Publisher",
+        published_date=date(2000, 1, 1),
+        page_count=100,
+        language="English",
+    )
+    book.reviews = [
+        Review(rating=3, review_text="Old", updated_at=datetime(2024, 1, 1)),
+        Review(rating=4, review_text="New", updated_at=datetime(2024, 1, 2)),
+    ]
+    session.add(book)
+    await session.commit()
+
+    return book
+
+
+async def test_book_version_changes_with_book_and_reviews(db_session):
+    book = await seed_book(db_session)
+    versions = [await book_service.get_book_version(book.uid, db_session)]
+
+    await book_service.update_book(
+        book.uid,
+        BookUpdateModel(
+            title="Renamed", author="Author", publisher="Publisher", page_count=1, language="English"
+        ),
+        db_session,
+    )
+    versions.append(await book_service.get_book_version(book.uid, db_session))
+
+    # dropping the older review leaves the newest review timestamp as it was
+    old_review = next(review for review in book.reviews if review.review_text == "Old")
+    await db_session.delete(old_review)
+    book.review_count = 1
+    await db_session.commit()
+    versions.append(await book_service.get_book_version(book.uid, db_session))
+
+    assert len({etag for etag, _ in versions}) == 3
+    assert await book_service.get_book_version(uuid.uuid4(), db_session) is None
+
+
+async def test_book_detail_304_skips_loading_the_book(db_session, statements, monkeypatch):
+    book = await seed_book(db_session)
+
+    async def use_db_session():
+        yield db_session
+
+    monkeypatch.setitem(app.dependency_overrides, get_session, use_db_session)
+    monkeypatch.setitem(app.dependency_overrides, get_read_session, use_db_session)
+    monkeypatch.setitem(app.dependency_overrides, access_token_bearer, lambda: {})
+    monkeypatch.setitem(app.dependency_overrides, role_checker, lambda: True)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        first = await client.get(f"/api/v1/books/{book.uid}")
+        statements.clear()
+        second = await client.get(
+            f"/api/v1/books/{book.uid}", headers={"If-None-Match": first.headers["ETag"]}
+        )
+
+    assert first.status_code == 200
+    assert first.headers["Last-Modified"]
+    assert second.status_code == 304
+    assert second.headers["ETag"] == first.headers["ETag"]
+    # only the version query, not the book or its reviews
+    assert len(statements) == 1
@@ -0,0 +1,48 @@
+from src.db.main import ALEMBIC_INI, TimedQueuePool, check_migrations, make_engine, pool_stats
+from alembic.config import Config as AlembicConfig
+from alembic.script import ScriptDirectory
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy import text
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_checkouts_are_timed():
+    pytest.importorskip("aiosqlite")
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=TimedQueuePool, pool_size=1)
+    before = pool_stats.checkouts
+
+    for _ in range(3):
+        async with engine.connect() as connection:
+            await connection.execute(text("SELECT 1"))
+
+    snapshot = pool_stats.snapshot(engine.pool)
+    await engine.dispose()
+
+    assert snapshot["checkouts"] == before + 3
+    assert snapshot["pool_size"] == 1
+    assert snapshot["max_wait_seconds"] >= snapshot["avg_wait_seconds"] > 0
+
+
+async def test_startup_check_requires_the_alembic_head(db_engine):
+    with pytest.raises(RuntimeError, match="alembic upgrade head"):
+        await check_migrations(db_engine)
+
+    head = ScriptDirectory.from_config(AlembicConfig(ALEMBIC_INI)).get_current_head()
+
+    async with db_engine.begin() as connection:
+        await connection.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32))"))
+        await connection.execute(text("INSERT INTO alembic_version VALUES (:head)"), {"head": head})
+
+    await check_migrations(db_engine)
+
+
+async def test_statement_cache_arguments_are_only_given_to_asyncpg():
+    pytest.importorskip("aiosqlite")
+    engine = make_engine("sqlite+aiosqlite://")
+
+    async with engine.connect() as connection:
+        assert await connection.scalar(text("SELECT 1")) == 1
+
+    await engine.dispose()
@@ -0,0 +1,68 @@
+from src import app
+from src import health
+from src.health import ReadinessCheck
+from httpx import ASGITransport, AsyncClient
+import asyncio
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+async def healthy():
+    pass
+
+
+async def hanging():
+    await asyncio.sleep(10)
+
+
+async def broken():
+    raise ConnectionError("refused")
+
+
+async def test_checks_run_concurrently_with_a_timeout_each():
+    check = ReadinessCheck(
+        {"database": healthy, "redis": hanging, "broker": broken}, timeout=0.05, ttl=1
+    )
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    result = await check.get()
+
+    assert loop.time() - start < 0.5
+    assert not result["ready"]
+    assert result["checks"]["database"]["ok"]
+    assert result["checks"]["redis"]["error"] == "timed out after 0.05s"
+    assert result["checks"]["broker"]["error"] == "ConnectionError: refused"
+    assert all(c["latency_ms"] >= 0 for c in result["checks"].values())
+
+
+async def test_results_are_cached_and_shared_between_concurrent_probes():
+    calls = 0
+
+    async def counted():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+
+    check = ReadinessCheck({"database": counted}, timeout=1, ttl=60)
+
+    results = await asyncio.gather(*(check.get() for _ in range(5)))
+    await check.get()
+
+    assert calls == 1
+    assert all(result["ready"] for result in results)
+
+
+async def test_ready_endpoint_returns_503_when_a_dependency_is_down(monkeypatch):
+    monkeypatch.setattr(
+        health, "readiness", ReadinessCheck({"database": broken}, timeout=1, ttl=0)
+    )
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        live = await client.get("/health/live")
+        ready = await client.get("/health/ready")
+
+    assert live.status_code == 200
+    assert ready.status_code == 503
+    assert ready.json()["checks"]["database"]["ok"] is False
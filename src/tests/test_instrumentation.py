@@ -0,0 +1,63 @@
+from src.db.instrumentation import QueryStats, QueryStatsMiddleware, install, statement_shape, current_stats
+from src.db.models import Book
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import text
+from sqlmodel import select
+import logging
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def test_in_lists_share_a_shape():
+    assert statement_shape("SELECT * FROM t WHERE id IN (?, ?, ?)") == statement_shape(
+        "SELECT *\n FROM t WHERE id IN (?)"
+    )
+    assert statement_shape("SELECT * FROM t WHERE id IN ($1, $2)") == (
+        "SELECT * FROM t WHERE id IN (...)"
+    )
+
+
+def test_n_plus_one_only_counts_repeated_selects():
+    stats = QueryStats()
+
+    for _ in range(5):
+        stats.record("SELECT * FROM reviews WHERE book_uid = ?", 1000)
+        stats.record("INSERT INTO reviews VALUES (?, ?)", 1000)
+
+    assert stats.count == 10
+    assert stats.duration_ms == 0.01
+    assert stats.n_plus_one(5) == {"SELECT * FROM reviews WHERE book_uid = ?": 5}
+    assert stats.n_plus_one(6) == {}
+
+
+async def test_statements_outside_a_request_are_not_recorded(db_engine):
+    install(db_engine.sync_engine)
+
+    async with db_engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+    assert current_stats.get() is None
+
+
+async def test_middleware_reports_queries(db_engine, db_session, caplog):
+    install(db_engine.sync_engine)
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware, n_plus_one_threshold=3)
+
+    @app.get("/books")
+    async def get_books():
+        # one lookup per book, the pattern the detector is for
+        for _ in range(3):
+            await db_session.exec(select(Book).where(Book.title == "x"))
+
+        return []
+
+    with caplog.at_level(logging.INFO, logger="bookly.sql"):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get("/books")
+
+    assert response.headers["server-timing"].endswith('desc="3 queries"')
+    assert "GET /books: 3 queries" in caplog.text
+    assert "Possible N+1 in GET /books: 3 x SELECT" in caplog.text
@@ -0,0 +1,150 @@
+from src import app
+from src.celery_tasks import c_app, send_email, send_email_batch, smtp
+from src.mail import MailOutbox, SMTPConnection, create_message, mail_outbox
+from httpx import ASGITransport, AsyncClient
+import asyncio
+import smtplib
+import pytest
+
+
+class FakeSMTP:
+    def __init__(self, refused: dict | None = None) -> None:
+        self.sent = []
+        self.closed = False
+        self.refused = refused or {}
+
+    def send_message(self, message, to_addrs=None) -> dict:
+        if self.closed:
+            raise smtplib.SMTPServerDisconnected("idle timeout")
+
+        self.sent.append((message, to_addrs))
+        return {to: self.refused[to] for to in to_addrs or [] if to in self.refused}
+
+    def quit(self) -> None:
+        self.closed = True
+
+
+def test_connection_is_reused_and_reopened_when_dropped(monkeypatch):
+    sessions = []
+
+    def connect():
+        sessions.append(FakeSMTP())
+        return sessions[-1]
+
+    connection = SMTPConnection()
+    monkeypatch.setattr(connection, "connect", connect)
+    message = create_message(["reader@bookly.dev"], "Hello", "<p>Hi</p>")
+
+    connection.send(message)
+    connection.send(message)
+    sessions[0].closed = True
+    connection.send(message)
+
+    assert [len(session.sent) for session in sessions] == [2, 1]
+
+
+def test_mail_tasks_are_routed_to_the_mail_queue():
+    for task in (send_email, send_email_batch):
+        assert c_app.amqp.router.route({}, task.name)["queue"].name == "mail"
+
+
+def mail(to: str, subject: str = "Digest", attempt: int = 0) -> dict:
+    return {"to": to, "subject": subject, "html": "<p>News</p>", "attempt": attempt}
+
+
+def test_batch_coalesces_per_domain_and_retries_only_refused_recipients(monkeypatch):
+    session = FakeSMTP(
+        refused={"busy@b.org": (451, b"try later"), "gone@b.org": (550, b"no such user")}
+    )
+    retried = []
+    monkeypatch.setattr(smtp, "smtp", session)
+    monkeypatch.setattr(send_email_batch, "apply_async", lambda args, **kw: retried.append(args))
+
+    report = send_email_batch.run(
+        [mail("one@a.com"), mail("two@A.com"), mail("busy@b.org"), mail("gone@b.org"),
+         mail("welcome@a.com", subject="Welcome")]
+    )
+
+    # a.com digest, a.com welcome, b.org digest
+    assert [to_addrs for _, to_addrs in session.sent] == [
+        ["one@a.com", "two@A.com"], ["welcome@a.com"], ["busy@b.org", "gone@b.org"],
+    ]
+    assert session.sent[0][0]["To"] == "undisclosed-recipients:;"
+    assert session.sent[1][0]["To"] == "welcome@a.com"
+    assert report["sent"] == 3
+    assert set(report["failed"]) == {"busy@b.org", "gone@b.org"}
+    assert retried == [([mail("busy@b.org", attempt=1)],)]
+
+
+def test_batch_counts_each_delivered_message(monkeypatch):
+    session = FakeSMTP(refused={"busy@b.org": (451, b"try later")})
+    monkeypatch.setattr(smtp, "smtp", session)
+    monkeypatch.setattr(send_email_batch, "apply_async", lambda args, **kw: None)
+
+    # one recipient in two envelopes, refused in both
+    report = send_email_batch.run(
+        [mail("busy@b.org"), mail("busy@b.org", subject="Welcome"), mail("one@a.com")]
+    )
+
+    assert report["sent"] == 1
+    assert report["retrying"] == 2
+
+
+def test_outbox_publishes_full_batches_and_flushes_after_the_window(monkeypatch):
+    published = []
+    monkeypatch.setattr(send_email_batch, "delay", published.append)
+
+    async def scenario():
+        outbox = MailOutbox(batch_size=3, window=0.01)
+        outbox.add(["a@x.com", "b@x.com"], "Hi", "<p>Hi</p>")
+        assert published == []
+
+        outbox.add(["c@x.com", "d@x.com"], "Hi", "<p>Hi</p>")
+        assert [len(batch) for batch in published] == [3]
+
+        await asyncio.sleep(0.05)
+        assert [len(batch) for batch in published] == [3, 1]
+
+    asyncio.run(scenario())
+
+
+def test_outbox_retries_a_failed_publish_after_the_window(monkeypatch):
+    published = []
+    attempts = []
+
+    def delay(batch):
+        attempts.append(batch)
+
+        if len(attempts) == 1:
+            raise ConnectionError("broker unavailable")
+
+        published.append(batch)
+
+    monkeypatch.setattr(send_email_batch, "delay", delay)
+
+    async def scenario():
+        outbox = MailOutbox(batch_size=10, window=0.01)
+        outbox.add(["a@x.com"], "Hi", "<p>Hi</p>")
+
+        await asyncio.sleep(0.05)
+        assert [len(batch) for batch in published] == [1]
+        assert outbox.pending == []
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.anyio
+async def test_password_reset_is_published_during_the_request(monkeypatch):
+    published = []
+    monkeypatch.setattr(send_email_batch, "delay", published.append)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(
+            "/api/v1/auth/password-reset-request", json={"email": "reader@bookly.dev"}
+        )
+
+    assert response.status_code == 200
+    [[message]] = published
+    assert message["to"] == "reader@bookly.dev"
+    assert message["subject"] == "Password reset"
+    assert mail_outbox.pending == []
@@ -0,0 +1,94 @@
+from src.metrics import (
+    Registry,
+    MetricsMiddleware,
+    HTTP_REQUESTS,
+    HTTP_IN_FLIGHT,
+    collect,
+    merge,
+    render,
+    snapshot_path,
+)
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import json
+
+
+def test_render_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1.0))
+
+    for value in (0.05, 0.5, 0.7, 3.0):
+        latency.observe(value, "/books")
+
+    text = render(registry.snapshot())
+
+    assert 'latency_seconds_bucket{route="/books",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{route="/books",le="1.0"} 3' in text
+    assert 'latency_seconds_bucket{route="/books",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/books"} 4' in text
+
+
+def test_middleware_labels_requests_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/books/{book_uid}")
+    async def get_book(book_uid: str):
+        return {}
+
+    before = HTTP_REQUESTS.values.get(("GET", "/books/{book_uid}", "200"), 0)
+    client = TestClient(app)
+
+    client.get("/books/a")
+    client.get("/books/b")
+    client.get("/nowhere")
+
+    assert HTTP_REQUESTS.values[("GET", "/books/{book_uid}", "200")] == before + 2
+    assert HTTP_REQUESTS.values[("GET", "unmatched", "404")] >= 1
+    assert HTTP_IN_FLIGHT.values[("GET",)] == 0
+
+
+def test_merge_sums_workers_and_drops_gauges_of_dead_ones():
+    def worker(requests: int, in_flight: int) -> dict:
+        registry = Registry()
+        registry.counter("requests_total", "Requests").inc(amount=requests)
+        registry.gauge("in_flight", "In flight").inc(amount=in_flight)
+        registry.histogram("latency", "Latency", buckets=(1.0,)).observe(0.5)
+
+        return registry.snapshot()
+
+    merged = merge([worker(3, 1), worker(4, 2)], live=[True, False])
+
+    assert merged["requests_total"]["samples"] == [[[], 7]]
+    assert merged["in_flight"]["samples"] == [[[], 1]]
+    assert merged["latency"]["samples"] == [[[], [2, 0, 1.0]]]
+
+
+def test_collect_merges_snapshots_from_other_workers(tmp_path):
+    registry = Registry()
+    registry.counter("requests_total", "Requests").inc(amount=2)
+    snapshot = registry.snapshot()
+
+    # a worker that has since exited
+    snapshot_path(str(tmp_path), 2**22 + 1).write_text(json.dumps(snapshot))
+
+    assert "requests_total 4" in collect(snapshot, str(tmp_path))
+
+
+def test_metrics_endpoint(test_client):
+    response = test_client.get("/metrics")
+
+    assert response.status_code == 200
+    assert "# TYPE bookly_http_requests_total counter" in response.text
+    assert "bookly_db_pool_size" in response.text
+
+
+def test_celery_publishes_are_counted():
+    from celery import signals
+    from src.celery_tasks import send_email
+    from src.metrics import CELERY_TASKS_ENQUEUED
+
+    before = CELERY_TASKS_ENQUEUED.values.get((send_email.name,), 0)
+    signals.after_task_publish.send(sender=send_email.name, headers={}, body=None)
+
+    assert CELERY_TASKS_ENQUEUED.values[(send_email.name,)] == before + 1
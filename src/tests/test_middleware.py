@@ -0,0 +1,74 @@
+from src.middleware import AccessLogMiddleware, DroppingQueueHandler, JsonFormatter, access_handler
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+import json
+import logging
+import queue
+
+
+def make_client(sample_rate: float) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(AccessLogMiddleware, sample_rate=sample_rate)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: int):
+        if item_id == 0:
+            raise HTTPException(status_code=503)
+
+        return {"item_id": item_id}
+
+    return TestClient(app)
+
+
+def drain() -> list[logging.LogRecord]:
+    records = []
+
+    while not access_handler.queue.empty():
+        records.append(access_handler.queue.get_nowait())
+
+    return records
+
+
+def test_request_is_logged_with_route_and_duration():
+    drain()
+    make_client(sample_rate=1.0).get("/items/7")
+
+    [record] = drain()
+    fields = record.fields
+
+    assert fields["method"] == "GET"
+    assert fields["path"] == "/items/7"
+    assert fields["route"] == "/items/{item_id}"
+    assert fields["status"] == 200
+    assert fields["duration_ms"] >= 0
+
+
+def test_sampling_keeps_server_errors():
+    drain()
+    client = make_client(sample_rate=0.0)
+
+    client.get("/items/7")
+    client.get("/items/0")
+
+    assert [record.fields["status"] for record in drain()] == [503]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    record = logging.makeLogRecord({"msg": "request"})
+
+    handler.handle(record)
+    handler.handle(record)
+
+    assert handler.dropped == 1
+
+
+def test_json_formatter_merges_fields():
+    record = logging.makeLogRecord(
+        {"msg": "request", "name": "bookly.access", "levelname": "INFO", "fields": {"status": 200}}
+    )
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "request"
+    assert entry["status"] == 200
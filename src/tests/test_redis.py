@@ -0,0 +1,65 @@
+from src.db import redis
+from src.db.redis import RevokedJtiCache, token_in_blocklist
+from unittest.mock import AsyncMock, patch
+import time
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def synced_cache(**kwargs):
+    cache = RevokedJtiCache(maxsize=kwargs.get("maxsize", 10), max_staleness=5)
+    cache.synced_at = time.monotonic()
+    cache.complete_at = time.time()
+
+    return cache
+
+
+async def test_fresh_cache_answers_without_redis():
+    cache = synced_cache()
+    cache.add("revoked-jti")
+    lookup = AsyncMock()
+
+    with patch.object(redis, "revoked_jtis", cache), patch.object(redis.token_blocklist, "get", lookup):
+        assert await token_in_blocklist("revoked-jti")
+        assert not await token_in_blocklist("live-jti")
+
+    lookup.assert_not_called()
+
+
+async def test_stale_cache_falls_back_to_redis():
+    cache = synced_cache()
+    cache.synced_at -= 60
+    lookup = AsyncMock(return_value=b"")
+
+    with patch.object(redis, "revoked_jtis", cache), patch.object(redis.token_blocklist, "get", lookup):
+        assert await token_in_blocklist("revoked-elsewhere")
+
+    lookup.assert_awaited_once_with("revoked-elsewhere")
+
+
+def test_cache_is_not_trusted_until_index_covers_a_full_expiry_window():
+    cache = synced_cache()
+    cache.complete_at = time.time() + 60
+
+    assert not cache.fresh()
+
+
+def test_full_cache_is_not_trusted():
+    cache = synced_cache(maxsize=1)
+    cache.add("a")
+
+    assert not cache.fresh()
+
+
+def test_cache_is_trusted_again_once_revocations_expire():
+    cache = synced_cache(maxsize=3)
+
+    for i in range(5):
+        cache.add(f"jti-{i}", ttl=0.01)
+
+    assert not cache.fresh()
+
+    time.sleep(0.02)
+    assert cache.fresh()
+    assert len(cache.revoked) == 0
@@ -0,0 +1,98 @@
+from src.auth.utils import create_access_token
+from src.db import main
+from src.db.models import Tag
+from src.db.replicas import ReplicaSet, pinned_to_primary, recent_writers
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from starlette.requests import Request
+import uuid
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+
+def request_as(user_uid: str | None) -> Request:
+    headers = []
+
+    if user_uid is not None:
+        token = create_access_token({"email": "reader@bookly.dev", "user_uid": user_uid})
+        headers.append((b"authorization", f"Bearer {token}".encode()))
+
+    return Request({"type": "http", "headers": headers})
+
+
+@pytest.fixture
+async def replica_engines():
+    pytest.importorskip("aiosqlite")
+    engines = [create_async_engine("sqlite+aiosqlite://") for _ in range(2)]
+    yield engines
+
+    for engine in engines:
+        await engine.dispose()
+
+
+async def test_round_robin_skips_ejected_replicas(replica_engines):
+    first, second = replica_engines
+    replicas = ReplicaSet(replica_engines, eject_seconds=60)
+
+    assert [replicas.choose() for _ in range(3)] == [first, second, first]
+
+    replicas.eject(first)
+    assert [replicas.choose() for _ in range(2)] == [second, second]
+
+    replicas.eject(second)
+    assert replicas.choose() is None
+
+
+async def test_failed_check_ejects_and_passing_check_readmits(replica_engines):
+    [healthy, _] = replica_engines
+    down = create_async_engine("postgresql+asyncpg://bookly@127.0.0.1:1/bookly")
+    replicas = ReplicaSet([healthy, down], eject_seconds=60)
+    replicas.eject(healthy)
+
+    await replicas.check(healthy, timeout=1)
+    await replicas.check(down, timeout=1)
+
+    assert [replicas.choose() for _ in range(2)] == [healthy, healthy]
+
+
+async def test_reads_go_to_replicas_until_the_user_commits(
+    db_engine, replica_engines, monkeypatch
+):
+    monkeypatch.setattr(main, "replicas", ReplicaSet(replica_engines, eject_seconds=60))
+    user_uid = str(uuid.uuid4())
+
+    async def read_bind(request):
+        dependency = main.get_read_session(request)
+        session = await dependency.__anext__()
+        await dependency.aclose()
+
+        return session.bind
+
+    assert await read_bind(request_as(user_uid)) in replica_engines
+    assert await read_bind(request_as(None)) in replica_engines
+
+    # a commit on the primary session made for this user's request pins them
+    async with AsyncSession(db_engine) as session:
+        session.sync_session.info["user_uid"] = user_uid
+        session.add(Tag(name="pinned"))
+        await session.commit()
+
+    assert await pinned_to_primary(user_uid)
+    assert await read_bind(request_as(user_uid)) is main.engine
+    assert await read_bind(request_as(str(uuid.uuid4()))) in replica_engines
+
+    recent_writers.delete(user_uid)
+
+
+async def test_disconnect_ejects_the_replica(replica_engines, monkeypatch):
+    replicas = ReplicaSet(replica_engines[:1], eject_seconds=60)
+    monkeypatch.setattr(main, "replicas", replicas)
+
+    dependency = main.get_read_session(request_as(None))
+    await dependency.__anext__()
+
+    with pytest.raises(ConnectionRefusedError):
+        await dependency.athrow(ConnectionRefusedError())
+
+    assert replicas.choose() is None
@@ -0,0 +1,175 @@
+from src.response_cache import ResponseCache, MemoryBackend, book_namespace, BOOKS
+from src.books.models import BookPage
+from src.books.service import BookService
+from src.books.models import BookUpdateModel
+from src.db.models import Book
+from fastapi import FastAPI, Request
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from datetime import date
+from uuid import UUID
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+book_service = BookService()
+
+
+def make_client(cache: ResponseCache, session) -> AsyncClient:
+    app = FastAPI()
+
+    @app.get("/books")
+    async def get_books(request: Request, limit: int = 20):
+        return await cache.respond(
+            request, [BOOKS], BookPage, lambda: book_service.get_all_books(session, limit=limit)
+        )
+
+    @app.get("/books/{book_uid}")
+    async def get_book(request: Request, book_uid: UUID):
+        return await cache.respond(
+            request, [book_namespace(book_uid)], Book, lambda: book_service.get_book(book_uid, session)
+        )
+
+    return AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+
+async def seed_book(session) -> Book:
+    book = Book(
+        title="Cached",
+        author="Author",
+        publisher="Publisher",
+        published_date=date(2000, 1, 1),
+        page_count=100,
+        language="English",
+    )
+    session.add(book)
+    await session.commit()
+
+    return book
+
+
+async def test_second_request_is_served_from_cache(db_session, statements):
+    await seed_book(db_session)
+    cache = ResponseCache(MemoryBackend(maxsize=100, ttl=30), ttl=30)
+
+    async with make_client(cache, db_session) as client:
+        first = await client.get("/books", params={"limit": 5})
+        statements.clear()
+        second = await client.get("/books", params={"limit": 5})
+
+    assert second.json() == first.json()
+    assert first.json()["books"][0]["title"] == "Cached"
+    assert statements == []
+    assert cache.stats() == {"hits": {"/books": 1}, "misses": {"/books": 1}}
+
+
+async def test_invalidation_only_drops_its_namespace(db_session):
+    book = await seed_book(db_session)
+    cache = ResponseCache(MemoryBackend(maxsize=100, ttl=30), ttl=30)
+
+    async with make_client(cache, db_session) as client:
+        await client.get("/books")
+        await client.get(f"/books/{book.uid}")
+
+        await cache.invalidate(book_namespace(book.uid))
+
+        await client.get("/books")
+        await client.get(f"/books/{book.uid}")
+
+    assert cache.hits == {"/books": 1}
+    assert cache.misses == {"/books": 1, "/books/{book_uid}": 2}
+
+
+async def test_book_writes_invalidate_cached_responses(db_session, monkeypatch):
+    book = await seed_book(db_session)
+    cache = ResponseCache(MemoryBackend(maxsize=100, ttl=30), ttl=30)
+    monkeypatch.setattr("src.books.service.response_cache", cache)
+
+    async with make_client(cache, db_session) as client:
+        await client.get(f"/books/{book.uid}")
+
+        await book_service.update_book(
+            book.uid,
+            BookUpdateModel(
+                title="Renamed",
+                author="Author",
+                publisher="Publisher",
+                page_count=100,
+                language="English",
+            ),
+            db_session,
+        )
+        response = await client.get(f"/books/{book.uid}")
+
+    assert response.json()["title"] == "Renamed"
+    assert cache.hits == {}
+
+
+async def test_disabled_cache_passes_through(db_session):
+    cache = ResponseCache(MemoryBackend(maxsize=100, ttl=30), ttl=30, enabled=False)
+
+    async with make_client(cache, db_session) as client:
+        await client.get("/books")
+        await client.get("/books")
+
+    assert cache.stats() == {"hits": {}, "misses": {}}
+
+
+async def test_replica_reads_right_after_a_write_are_not_cached(db_session, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    book = await seed_book(db_session)
+    cache = ResponseCache(MemoryBackend(maxsize=100, ttl=30), ttl=30, replica_lag=5)
+    monkeypatch.setattr("src.books.service.response_cache", cache)
+
+    # a replica that has not applied the rename yet
+    lagging = create_async_engine("sqlite+aiosqlite://")
+
+    async with lagging.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    replica_session = AsyncSession(lagging)
+    replica_session.add(Book(**book.model_dump()))
+    await replica_session.commit()
+
+    app = FastAPI()
+
+    @app.get("/books/{book_uid}")
+    async def get_book(request: Request, book_uid: UUID):
+        replica = "x-pinned" not in request.headers
+        session = replica_session if replica else db_session
+
+        return await cache.respond(
+            request,
+            [book_namespace(book_uid)],
+            Book,
+            lambda: book_service.get_book(book_uid, session),
+            replica=replica,
+        )
+
+    await book_service.update_book(
+        book.uid,
+        BookUpdateModel(
+            title="Renamed",
+            author="Author",
+            publisher="Publisher",
+            page_count=100,
+            language="English",
+        ),
+        db_session,
+    )
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        from_replica = await client.get(f"/books/{book.uid}")
+        pinned = await client.get(f"/books/{book.uid}", headers={"x-pinned": "1"})
+        after_pinned = await client.get(f"/books/{book.uid}")
+
+    await replica_session.close()
+    await lagging.dispose()
+
+    assert from_replica.json()["title"] == "Cached"
+    assert pinned.json()["title"] == "Renamed"
+    # the primary's response was cached and is served to replica readers too
+    assert after_pinned.json()["title"] == "Renamed"
+    assert cache.hits == {"/books/{book_uid}": 1}
@@ -0,0 +1,57 @@
+from src.reviews.service import ReviewService
+from src.reviews.schemas import ReviewCreateModel
+from src.books.service import BookService
+from src.books.models import BookSort
+from src.tests.test_books import seed_books
+from src.db.models import Book
+from sqlmodel import select
+import uuid
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+review_service = ReviewService()
+book_service = BookService()
+
+
+async def add_review(session, book_uid, rating: int):
+    return await review_service.add_review_to_book(
+        user_uid=uuid.uuid4(),
+        book_uid=book_uid,
+        review_data=ReviewCreateModel(rating=rating, review_text="Review"),
+        session=session,
+    )
+
+
+@pytest.mark.allow_repeated_queries
+async def test_reviews_maintain_rating_aggregates(db_session):
+    await seed_books(db_session, 1)
+    book = (await db_session.exec(select(Book))).one()
+
+    for rating in (4, 4, 1):
+        review = await add_review(db_session, book.uid, rating)
+
+    await review_service.delete_review(review.uid, db_session)
+    book = await book_service.get_book(book.uid, db_session)
+
+    assert book.review_count == 2
+    assert book.rating_sum == 8
+    assert book.rating_avg == 4
+    assert book.rating_histogram == {"4": 2}
+
+
+async def test_books_sorted_by_rating(db_session):
+    await seed_books(db_session, 4)
+    books = (await db_session.exec(select(Book).order_by(Book.title))).all()
+
+    for book, rating in zip(books, (2, 4, 3, 1)):
+        await add_review(db_session, book.uid, rating)
+
+    first = await book_service.get_all_books(db_session, limit=2, sort=BookSort.rating)
+    second = await book_service.get_all_books(
+        db_session, first["next_cursor"], limit=2, sort=BookSort.rating
+    )
+
+    ratings = [book.rating_avg for book in first["books"] + second["books"]]
+    assert ratings == [4, 3, 2, 1]
+    assert second["next_cursor"] is None
@@ -0,0 +1,42 @@
+from src.books.models import Book as BookModel, BookPage
+from src.books.service import BookService
+from src.serialization import dump_json, plain
+from src.db.models import Book
+from src.tests.test_books import seed_books
+from datetime import date
+from fastapi.encoders import jsonable_encoder
+import json
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+book_service = BookService()
+
+
+async def test_rows_serialise_like_the_response_model_path(db_session):
+    await seed_books(db_session, 3)
+    page = await book_service.get_all_books(db_session, limit=2)
+
+    expected = jsonable_encoder(BookPage.model_validate(page, from_attributes=True))
+
+    assert json.loads(dump_json(BookPage, page)) == expected
+    assert all(isinstance(book, dict) for book in plain(page)["books"])
+
+
+async def test_orm_objects_are_validated_from_attributes(db_session):
+    book = Book(
+        title="Dune",
+        author="Frank Herbert",
+        publisher="Chilton",
+        published_date=date(1965, 8, 1),
+        page_count=412,
+        language="English",
+    )
+    db_session.add(book)
+    await db_session.commit()
+
+    body = json.loads(dump_json(BookModel, book))
+
+    assert body["uid"] == str(book.uid)
+    # fields outside the response model are not exposed
+    assert "user_uid" not in body
@@ -0,0 +1,57 @@
+from src.tags.service import TagService
+from src.tags.schemas import TagAddModel, TagCreateModel
+from src.db.models import Book, BookTag, Tag
+from sqlmodel import select
+from datetime import date
+import pytest
+
+pytestmark = pytest.mark.anyio
+
+tag_service = TagService()
+
+
+async def seed_book(session):
+    book = Book(
+        title="Tagged",
+        author="Author",
+        publisher="Publisher",
+        published_date=date(2000, 1, 1),
+        page_count=100,
+        language="English",
+    )
+    session.add(book)
+    session.add_all([Tag(name=f"tag-{i}") for i in range(0, 30, 2)])
+    await session.commit()
+
+    return book
+
+
+async def test_add_tags_to_book_in_constant_statements(pg_session, pg_statements):
+    book = await seed_book(pg_session)
+    names = [f"tag-{i}" for i in range(30)]
+    pg_statements.clear()
+
+    await tag_service.add_tag_to_book(
+        book.uid, TagAddModel(tags=[TagCreateModel(name=name) for name in names]), pg_session
+    )
+
+    # book lookup, tag IN lookup, tag insert, link insert, commit
+    assert len(pg_statements) <= 5
+
+    tags = (await pg_session.exec(select(Tag.name))).all()
+    links = (await pg_session.exec(select(BookTag).where(BookTag.book_uid == book.uid))).all()
+
+    assert sorted(tags) == sorted(names)
+    assert len(links) == 30
+
+
+async def test_retagging_a_book_is_idempotent(pg_session):
+    book = await seed_book(pg_session)
+    tag_data = TagAddModel(tags=[TagCreateModel(name="tag-0"), TagCreateModel(name="new")])
+
+    await tag_service.add_tag_to_book(book.uid, tag_data, pg_session)
+    await tag_service.add_tag_to_book(book.uid, tag_data, pg_session)
+
+    links = (await pg_session.exec(select(BookTag).where(BookTag.book_uid == book.uid))).all()
+
+    assert len(links) == 2